@@ -0,0 +1,92 @@
+"""Compare `pagify` with the implementation it replaced on 1 MB inputs.
+
+Run from the repository root::
+
+    python -m benchmarks.bench_pagify
+
+"""
+import random
+import string
+import timeit
+
+from core.utils.chat_formatting import escape, pagify
+
+SIZE = 1_000_000
+
+
+def legacy_pagify(
+    text, delims=["\n"], *, priority=False, escape_mass_mentions=True, shorten_by=8, page_length=2000
+):
+    """`pagify` before it was made linear, re-slicing the text after every page."""
+    in_text = text
+    page_length -= shorten_by
+    while len(in_text) > page_length:
+        this_page_len = page_length
+        if escape_mass_mentions:
+            this_page_len -= in_text.count("@here", 0, page_length) + in_text.count(
+                "@everyone", 0, page_length
+            )
+        closest_delim = (in_text.rfind(d, 1, this_page_len) for d in delims)
+        if priority:
+            closest_delim = next((x for x in closest_delim if x > 0), -1)
+        else:
+            closest_delim = max(closest_delim)
+        closest_delim = closest_delim if closest_delim != -1 else this_page_len
+        if escape_mass_mentions:
+            to_send = escape(in_text[:closest_delim], mass_mentions=True)
+        else:
+            to_send = in_text[:closest_delim]
+        if len(to_send.strip()) > 0:
+            yield to_send
+        in_text = in_text[closest_delim:]
+
+    if len(in_text.strip()) > 0:
+        if escape_mass_mentions:
+            yield escape(in_text, mass_mentions=True)
+        else:
+            yield in_text
+
+
+def make_lines(size: int, seed: int = 0) -> list:
+    rng = random.Random(seed)
+    lines = []
+    length = 0
+    while length < size:
+        line = " ".join(
+            "".join(rng.choices(string.ascii_letters, k=rng.randint(1, 10)))
+            for _ in range(rng.randint(1, 12))
+        )
+        if rng.random() < 0.01:
+            line += " @everyone"
+        lines.append(line)
+        length += len(line) + 1
+    return lines
+
+
+def bench(name, func, number=5):
+    best = min(timeit.repeat(func, number=1, repeat=number))
+    print(f"{name:<40}{best * 1000:>10.1f} ms")
+
+
+def main():
+    lines = make_lines(SIZE)
+    text = "\n".join(lines)
+    print(f"{len(text)} characters, {len(lines)} lines")
+    for page_length in (2000, 1000):
+        bench(
+            f"legacy, page_length={page_length}",
+            lambda: list(legacy_pagify(text, page_length=page_length)),
+        )
+        bench(f"str, page_length={page_length}", lambda: list(pagify(text, page_length=page_length)))
+        bench(
+            f"lines, page_length={page_length}",
+            lambda: list(pagify(lines, page_length=page_length)),
+        )
+    # A single line can't be broken at a delimiter.
+    blob = text.replace("\n", " ")
+    bench("legacy, no newlines", lambda: list(legacy_pagify(blob)))
+    bench("str, no newlines", lambda: list(pagify(blob)))
+
+
+if __name__ == "__main__":
+    main()
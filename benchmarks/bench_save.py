@@ -0,0 +1,72 @@
+"""Measure how long saving a large datastore holds up the event loop, with
+the snapshot encoded in a thread and in a worker process.
+
+Run from the repository root::
+
+    python -m benchmarks.bench_save
+
+"""
+import asyncio
+import tempfile
+import time
+from pathlib import Path
+
+from core import json_io
+from core.json_io import JsonIO, get_codec
+
+GUILDS = 20000
+
+
+def make_data() -> dict:
+    return {
+        "GUILD": {
+            str(guild): {
+                "prefix": ["!", "?"],
+                "locked_channels": list(range(guild, guild + 5)),
+                "description": "x" * 100,
+            }
+            for guild in range(GUILDS)
+        }
+    }
+
+
+async def loop_lag(done: asyncio.Event, interval: float = 0.001) -> float:
+    """Get the longest delay of a timer waiting ``interval`` seconds."""
+    worst = 0.0
+    while not done.is_set():
+        start = time.perf_counter()
+        await asyncio.sleep(interval)
+        worst = max(worst, time.perf_counter() - start - interval)
+    return worst
+
+
+async def measure(io: JsonIO, data: dict) -> tuple:
+    done = asyncio.Event()
+    lag = asyncio.ensure_future(loop_lag(done))
+    await asyncio.sleep(0.01)
+    start = time.perf_counter()
+    await io._threadsafe_save_json(data)
+    elapsed = time.perf_counter() - start
+    done.set()
+    return elapsed, await lag
+
+
+async def main():
+    data = make_data()
+    for codec in ("json", "binary"):
+        path = Path(tempfile.mkdtemp()) / "settings.json"
+        io = JsonIO(path, codec=get_codec(codec))
+        io._save_json(data)
+        size = path.stat().st_size
+        for name, threshold in (("thread", float("inf")), ("process", 0)):
+            json_io.PROCESS_ENCODE_SIZE = threshold
+            await measure(io, data)  # warm up the worker process
+            elapsed, lag = await measure(io, data)
+            print(
+                f"{codec:6} {size / 2**20:5.1f} MB  {name:7}  "
+                f"save {elapsed * 1000:6.1f} ms  max loop lag {lag * 1000:6.1f} ms"
+            )
+
+
+if __name__ == "__main__":
+    asyncio.get_event_loop().run_until_complete(main())
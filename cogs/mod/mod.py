@@ -1,4 +1,5 @@
 # -*- coding: utf-8 -*-
+import asyncio
 import logging
 from typing import Union
 from datetime import datetime
@@ -23,9 +24,11 @@ class Mod:
         "whitelist": [],
         "current_tempbans": [],
         "safe_roles": [],
-        "voice_text_role": None
+        "voice_text_role": None,
+        "locked_channels": [],
     }
 
+    # Channels used to be locked with this setting, see _migrate_locked.
     default_channel_settings = {"locked": False}
 
     default_member_settings = {"past_nicks": [], "banned_until": False}
@@ -39,6 +42,55 @@ class Mod:
         self.conf.register_channel(**self.default_channel_settings)
         self.conf.register_member(**self.default_member_settings)
         self.conf.register_user(**self.default_user_settings)
+        self.bot.settings_cache.register_provider("locked_channels", self._locked_channels)
+        self._unsubscribe = self.conf.on_change(Config.GUILD, self._on_guild_change)
+        loop = asyncio.get_event_loop()
+        loop.create_task(self._migrate_locked())
+
+    def __unload(self):
+        self._unsubscribe()
+        self.bot.settings_cache.unregister_provider("locked_channels")
+
+    async def _migrate_locked(self):
+        """Move channels locked with the old channel setting into the
+        ``locked_channels`` of their guild.
+        """
+        await self.bot.wait_until_ready()
+        moved = {}
+        for channel_id, data in (await self.conf.all_channels()).items():
+            channel = self.bot.get_channel(int(channel_id))
+            if data.get("locked") and channel is not None:
+                moved.setdefault(channel.guild, []).append(channel)
+        for guild, channels in moved.items():
+            async with self.conf.transaction():
+                locked = set(await self.conf.guild(guild).locked_channels())
+                locked.update(channel.id for channel in channels)
+                await self.conf.guild(guild).locked_channels.set(sorted(locked))
+                for channel in channels:
+                    await self.conf.channel(channel).locked.clear()
+        if moved:
+            logger.info(f"Moved locked channels of {len(moved)} guilds to the guild settings")
+
+    async def _locked_channels(self, guild: discord.Guild):
+        locked = await self.conf.guild(guild).locked_channels.view()
+        self.bot.settings_cache.count_reads()
+        return frozenset(locked)
+
+    def _on_guild_change(self, identifiers, value):
+        if len(identifiers) == 1:
+            self.bot.settings_cache.invalidate()
+        elif len(identifiers) == 2 or identifiers[2] == "locked_channels":
+            self.bot.settings_cache.invalidate(int(identifiers[1]))
+
+    async def _set_locked(self, channel: discord.TextChannel, locked: bool):
+        async with self.conf.guild(channel.guild).locked_channels() as channels:
+            if locked and channel.id not in channels:
+                channels.append(channel.id)
+            elif not locked and channel.id in channels:
+                channels.remove(channel.id)
+        if not locked:
+            # Don't let _migrate_locked lock it again.
+            await self.conf.channel(channel).locked.clear()
 
     async def on_message(self, message: discord.Message):
         author = message.author
@@ -47,13 +99,12 @@ class Mod:
         valid_user = isinstance(author, discord.Member) and not author.bot
         if not valid_user:
             return
-        mod_or_superior = await is_mod_or_superior(self.bot, obj=author)
-        if mod_or_superior:
+        if await self.bot.permission_cache.is_mod(author):
             return
-        locked = await self.conf.channel(message.channel).locked()
         if message.type == MessageType.new_member:
             return
-        if locked:
+        settings = await self.bot.settings_cache.get(message.guild)
+        if message.channel.id in settings.locked_channels:
             await message.delete()
 
     async def on_voice_state_update(
@@ -123,7 +174,7 @@ class Mod:
             channel_ = discord.utils.get(ctx.guild.channels, name=channel)
         if not channel_:
             await ctx.send(f"Could not find channel {channel}")
-        await self.conf.channel(channel_).locked.set(True)
+        await self._set_locked(channel_, True)
         await ctx.send(f"Locked channel {channel_} for posting")
 
     @commands.command(name="unlock")
@@ -140,7 +191,7 @@ class Mod:
             channel_ = discord.utils.get(ctx.guild.channels, name=channel)
         if not channel_:
             await ctx.send(f"Could not find channel {channel}")
-        await self.conf.channel(channel_).locked.set(False)
+        await self._set_locked(channel_, False)
         await ctx.send(f"Unlocked channel {channel_} for posting")
 
     @commands.group()
@@ -0,0 +1,5 @@
+from .permissions import Permissions
+
+
+def setup(bot):
+    bot.add_cog(Permissions(bot))
@@ -0,0 +1,240 @@
+import logging
+from typing import Union
+
+import discord
+from discord.ext import commands
+
+from core.caches import PermissionLevel
+from core.config import Config
+from core import checks
+from core.utils.chat_formatting import box, pagify
+from .rules import ALL, CompiledRules, subject_keys
+
+logger = logging.getLogger("tbv.permissions")
+
+# Levels of the checks in `core.checks` which rules can grant.
+_LEVELS = {
+    "mod": PermissionLevel.MOD,
+    "admin": PermissionLevel.ADMIN,
+    "guildowner": PermissionLevel.GUILD_OWNER,
+}
+
+
+class Permissions:
+    """Allow or deny commands per guild, channel, role or user."""
+
+    def __init__(self, bot, config=Config):
+        self.bot = bot
+        self.conf = config.get_cog_conf(self, force_registration=True)
+        self.conf.register_guild(rules={})
+        # guild id -> CompiledRules
+        self._compiled = {}
+        self._unsubscribe = self.conf.on_change(Config.GUILD, self._on_guild_change)
+
+    def __unload(self):
+        self._unsubscribe()
+
+    def _on_guild_change(self, identifiers, value):
+        self.bot.help_cache.clear()
+        if len(identifiers) == 3 and identifiers[2] == "rules":
+            # Rules are compiled when they change, not when they are used.
+            self._compiled[int(identifiers[1])] = CompiledRules(value or {})
+        elif len(identifiers) > 1:
+            self._compiled.pop(int(identifiers[1]), None)
+        else:
+            self._compiled.clear()
+
+    async def _rules(self, guild: discord.Guild) -> CompiledRules:
+        try:
+            return self._compiled[guild.id]
+        except KeyError:
+            pass
+        rules = CompiledRules(await self.conf.guild(guild).rules.view())
+        # Rules compiled by a change in the meantime are newer.
+        return self._compiled.setdefault(guild.id, rules)
+
+    async def _evaluate(self, ctx):
+        if ctx.guild is None or ctx.command is None:
+            return None
+        rules = await self._rules(ctx.guild)
+        if not rules:
+            return None
+        command = ctx.command
+        return rules.evaluate(
+            subject_keys(command.qualified_name, command.cog_name),
+            ctx.author.id,
+            ctx.channel.id,
+            getattr(ctx.author, "roles", ()),
+        )
+
+    async def check_overrides(self, ctx, level: str):
+        """Called by the checks in `core.checks` to let rules override them.
+
+        An allow rule only grants commands its author could use, and rules
+        never apply to commands only the bot owner may use.
+
+        Returns
+        -------
+        bool
+            Whether a rule allows the command, :code:`None` if no rule
+            applies.
+
+        """
+        required = _LEVELS.get(level)
+        if required is None:
+            return None
+        rule = await self._evaluate(ctx)
+        if rule is None or rule is False:
+            return rule
+        # Rules stored as True were set before levels were recorded, which
+        # already required admin.
+        granted = PermissionLevel.ADMIN if rule is True else rule
+        return True if granted >= required else None
+
+    def help_signature(self, ctx):
+        """Called by `core.help_formatter.HelpCache` to key cached help pages.
+
+        Rules for channels and roles are covered by the rest of the key, so
+        only rules for users make help depend on who asks.
+        """
+        if ctx.guild is None:
+            return None
+        rules = self._compiled.get(ctx.guild.id)
+        if rules is None or rules.has_user_rules:
+            return ctx.author.id
+        return None
+
+    async def __global_check(self, ctx):
+        # Deny rules apply to commands without checks as well, but never to
+        # the bot owner.
+        if ctx.cog is self or await checks._is_owner(ctx):
+            return True
+        return await self._evaluate(ctx) is not False
+
+    def _subject(self, name: str):
+        if name == ALL:
+            return ALL
+        command = self.bot.get_command(name)
+        if command is not None:
+            return "command:" + command.qualified_name
+        if self.bot.get_cog(name) is not None:
+            return "cog:" + name
+        return None
+
+    @staticmethod
+    def _target(target) -> str:
+        if target is None:
+            return "guild"
+        if isinstance(target, discord.Role):
+            return f"role:{target.id}"
+        if isinstance(target, discord.TextChannel):
+            return f"channel:{target.id}"
+        return f"user:{target.id}"
+
+    async def _set_rule(self, ctx, subject_name: str, target, allow):
+        subject = self._subject(subject_name)
+        if subject is None:
+            await ctx.send(f"Could not find command or cog {subject_name}")
+            return False
+        target_key = self._target(target)
+        async with self.conf.guild(ctx.guild).rules() as rules:
+            if allow is None:
+                rules.get(subject, {}).pop(target_key, None)
+                if not rules.get(subject, True):
+                    del rules[subject]
+            else:
+                rules.setdefault(subject, {})[target_key] = allow
+        return True
+
+    async def _author_level(self, ctx) -> int:
+        # Anyone who can set rules is at least an admin.
+        level = await self.bot.permission_cache.level(ctx.author)
+        return int(max(level, PermissionLevel.ADMIN))
+
+    @commands.group(name="permissions", aliases=["perms"])
+    @commands.guild_only()
+    @checks.admin_or_permissions(administrator=True)
+    async def permissions(self, ctx):
+        """
+        Allow or deny commands in this server.
+
+        Rules apply to a command, its subcommands, all commands of a cog,
+        or all commands if `all` is given instead. They can target a
+        user, channel, role or the whole server if no target is given.
+
+        Rules apply to mods too, but never to the bot owner. Allowing a
+        command only grants it up to your own level: admins can't allow
+        commands reserved to the server owner.
+        """
+        pass
+
+    @permissions.command(name="allow")
+    async def allow(
+            self,
+            ctx,
+            subject: str,
+            *,
+            target: Union[discord.Member, discord.Role, discord.TextChannel] = None
+    ):
+        """
+        Allow a command or cog.
+
+        Example:
+        `[p]permissions allow "stream add" @Streamers`
+        """
+        if await self._set_rule(ctx, subject, target, await self._author_level(ctx)):
+            await ctx.send(f"Allowed {subject} for {target or 'this server'}.")
+
+    @permissions.command(name="deny")
+    async def deny(
+            self,
+            ctx,
+            subject: str,
+            *,
+            target: Union[discord.Member, discord.Role, discord.TextChannel] = None
+    ):
+        """
+        Deny a command or cog.
+
+        Example:
+        `[p]permissions deny all #general`
+        """
+        if await self._set_rule(ctx, subject, target, False):
+            await ctx.send(f"Denied {subject} for {target or 'this server'}.")
+
+    @permissions.command(name="remove")
+    async def remove(
+            self,
+            ctx,
+            subject: str,
+            *,
+            target: Union[discord.Member, discord.Role, discord.TextChannel] = None
+    ):
+        """
+        Remove the rule for a command or cog.
+
+        Example:
+        `[p]permissions remove Twitter @Muted`
+        """
+        if await self._set_rule(ctx, subject, target, None):
+            await ctx.send(f"Removed rule for {subject} and {target or 'this server'}.")
+
+    @permissions.command(name="list")
+    async def list_rules(self, ctx):
+        """Lists the rules of this server."""
+        rules = await self.conf.guild(ctx.guild).rules.view()
+        if not rules:
+            await ctx.send("There are no rules in this server.")
+            return
+        message = ""
+        for subject, targets in sorted(rules.items()):
+            for target, allow in sorted(targets.items()):
+                message += f"{'allow' if allow else 'deny':<6}{subject:<30}{target}\n"
+        for page in pagify(message):
+            await ctx.send(box(page))
+
+    @permissions.command(name="reset")
+    async def reset(self, ctx):
+        """Removes all rules of this server."""
+        await self.conf.guild(ctx.guild).rules.clear()
+        await ctx.send("Removed all rules.")
@@ -0,0 +1,116 @@
+from typing import Iterable
+
+__all__ = ["CompiledRules", "subject_keys"]
+
+#: Subject matching every command.
+ALL = "all"
+
+
+def subject_keys(qualified_name: str, cog_name: str = None) -> tuple:
+    """Get the subjects whose rules apply to a command, most specific first.
+
+    A command is covered by its own rules, then those of its parent
+    commands, then those of its cog, then rules for all commands.
+
+    Example
+    -------
+    ::
+
+        >>> subject_keys("stream add", "Streaming")
+        ('command:stream add', 'command:stream', 'cog:Streaming', 'all')
+
+    """
+    keys = []
+    name = qualified_name
+    while name:
+        keys.append("command:" + name)
+        name = name.rpartition(" ")[0]
+    if cog_name:
+        keys.append("cog:" + cog_name)
+    keys.append(ALL)
+    return tuple(keys)
+
+
+class CompiledRules:
+    """The permission rules of a guild, compiled into lookup tables.
+
+    Rules are stored as ``{subject: {target: allow}}``, where a subject is
+    ``"command:<qualified name>"``, ``"cog:<name>"`` or ``"all"``, and a
+    target is ``"user:<id>"``, ``"channel:<id>"``, ``"role:<id>"`` or
+    ``"guild"``. ``allow`` is :code:`False` for a deny rule, and for an
+    allow rule the `PermissionLevel` of whoever set it. Compiling splits
+    every subject's rules into a dict per target type, so evaluating them
+    takes a dict lookup per subject and target type.
+
+    Parameters
+    ----------
+    rules : `collections.abc.Mapping`
+        The rules of the guild.
+
+    """
+
+    __slots__ = ("_subjects", "has_user_rules")
+
+    def __init__(self, rules):
+        # subject -> (users, channels, roles, guild)
+        self._subjects = {}
+        self.has_user_rules = False
+        for subject, targets in rules.items():
+            tables = {"user": {}, "channel": {}, "role": {}}
+            default = None
+            for target, allow in targets.items():
+                kind, _, target_id = target.partition(":")
+                if kind == "guild":
+                    default = allow
+                else:
+                    tables[kind][int(target_id)] = allow
+            self._subjects[subject] = (tables["user"], tables["channel"], tables["role"], default)
+            self.has_user_rules = self.has_user_rules or bool(tables["user"])
+
+    def __bool__(self):
+        return bool(self._subjects)
+
+    def evaluate(self, subjects: Iterable[str], user_id: int, channel_id: int, roles=()):
+        """Find the rule which applies to a use of a command.
+
+        Rules of more specific subjects win. For the same subject, a rule for
+        the user wins over one for the channel, which wins over one for the
+        user's highest role with a rule, which wins over the guild's rule.
+
+        Parameters
+        ----------
+        subjects : `iterable` of `str`
+            The subjects of the command, as returned by `subject_keys`.
+        user_id : int
+            ID of the user invoking the command.
+        channel_id : int
+            ID of the channel it is invoked in.
+        roles : `iterable` of `discord.Role`
+            Roles of the user, lowest first.
+
+        Returns
+        -------
+        bool or int
+            The ``allow`` value of the rule, :code:`None` if no rule
+            applies.
+
+        """
+        role_ids = None
+        for subject in subjects:
+            entry = self._subjects.get(subject)
+            if entry is None:
+                continue
+            users, channels, role_rules, allow = entry
+            if user_id in users:
+                return users[user_id]
+            if channel_id in channels:
+                return channels[channel_id]
+            if role_rules:
+                if role_ids is None:
+                    role_ids = [role.id for role in reversed(roles)]
+                for role_id in role_ids:
+                    if role_id in role_rules:
+                        return role_rules[role_id]
+            if allow is not None:
+                return allow
+        return None
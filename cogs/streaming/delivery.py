@@ -0,0 +1,196 @@
+import asyncio
+import logging
+import time
+from collections import deque
+
+import discord
+
+__all__ = ["MentionableRoles", "WebhookDelivery"]
+
+log = logging.getLogger("tbv.twitter")
+
+
+class WebhookDelivery:
+    """Sends to many webhooks concurrently.
+
+    Deliveries to different webhooks run at the same time. Only the
+    requests to Discord count towards the limit of ``limit`` at once, so
+    a delivery waiting for something else, e.g. a role to become
+    mentionable, doesn't hold up the others. Deliveries to the same
+    webhook send one after another, in the order they were submitted.
+
+    Parameters
+    ----------
+    limit : int
+        Maximum number of requests in progress at once.
+    history : int
+        Number of delivery latencies kept for `stats`.
+
+    """
+
+    def __init__(self, limit: int = 8, history: int = 1000):
+        self._semaphore = asyncio.Semaphore(limit)
+        # key -> future done once the last delivery submitted for it sent
+        self._tails = {}
+        self.latencies = deque(maxlen=history)
+
+    def submit(self, key, send) -> asyncio.Future:
+        """Schedule a delivery.
+
+        Parameters
+        ----------
+        key
+            Identifies the webhook, e.g. its URL.
+        send
+            Coroutine function making the delivery. It is called with a
+            coroutine function ``bounded``, and must make its request by
+            awaiting ``bounded(coro)``, which runs ``coro`` within the
+            concurrency limit.
+
+        Returns
+        -------
+        asyncio.Future
+            The result of ``send``.
+
+        """
+        previous = self._tails.get(key)
+        sent = self._tails[key] = asyncio.get_event_loop().create_future()
+        task = asyncio.ensure_future(self._run(send, previous, sent, time.perf_counter()))
+
+        def done(_):
+            if not sent.done():
+                sent.set_result(None)
+            if self._tails.get(key) is sent:
+                del self._tails[key]
+
+        task.add_done_callback(done)
+        return task
+
+    async def _run(self, send, previous, sent, queued: float):
+        if previous is not None:
+            await previous
+
+        async def bounded(coro):
+            try:
+                async with self._semaphore:
+                    return await coro
+            finally:
+                # The latency is up to the request being done, not up to
+                # cleaning up afterwards.
+                self.latencies.append(time.perf_counter() - queued)
+                if not sent.done():
+                    sent.set_result(None)
+
+        return await send(bounded)
+
+    async def fan_out(self, deliveries) -> list:
+        """Submit deliveries and wait for all of them. Errors are logged.
+
+        Parameters
+        ----------
+        deliveries : `iterable` of `tuple`
+            ``(key, send)`` pairs, as passed to `submit`.
+
+        Returns
+        -------
+        list
+            Results of the deliveries, or the exceptions they raised.
+
+        """
+        tasks = [self.submit(key, send) for key, send in deliveries]
+        results = await asyncio.gather(*tasks, return_exceptions=True)
+        for result in results:
+            if isinstance(result, Exception):
+                log.error("Webhook delivery failed", exc_info=result)
+        return results
+
+    def stats(self) -> dict:
+        """Get the latencies of recent deliveries, in seconds, from being
+        submitted to their request being done.
+        """
+        if not self.latencies:
+            return {"deliveries": 0, "mean": 0.0, "p95": 0.0, "max": 0.0}
+        latencies = sorted(self.latencies)
+        return {
+            "deliveries": len(latencies),
+            "mean": sum(latencies) / len(latencies),
+            "p95": latencies[int(0.95 * (len(latencies) - 1))],
+            "max": latencies[-1],
+        }
+
+
+class MentionableRoles:
+    """Makes roles mentionable while they are being mentioned.
+
+    A role is made mentionable by the first delivery mentioning it and
+    made unmentionable again ``delay`` seconds after the last one, so
+    concurrent deliveries share a single toggle.
+
+    Parameters
+    ----------
+    delay : float
+        Seconds to wait after editing a role before mentioning it, and
+        after mentioning it before editing it back.
+
+    """
+
+    def __init__(self, delay: float = 2.0):
+        self.delay = delay
+        # role id -> [number of users, task making it mentionable]
+        self._roles = {}
+        # role id -> task making it unmentionable
+        self._reverting = {}
+
+    def mentionable(self, role: discord.Role) -> "_Mentionable":
+        """Get an async context manager in which ``role`` is mentionable."""
+        return _Mentionable(self, role)
+
+    async def _acquire(self, role: discord.Role):
+        entry = self._roles.get(role.id)
+        if entry is None:
+            ready = asyncio.ensure_future(self._make_mentionable(role))
+            entry = self._roles[role.id] = [0, ready]
+        entry[0] += 1
+        try:
+            await asyncio.shield(entry[1])
+        except BaseException:
+            await self._release(role)
+            raise
+
+    async def _make_mentionable(self, role: discord.Role):
+        reverting = self._reverting.get(role.id)
+        if reverting is not None:
+            await asyncio.wait([reverting])
+        await role.edit(mentionable=True)
+        await asyncio.sleep(self.delay)
+
+    async def _release(self, role: discord.Role):
+        entry = self._roles[role.id]
+        entry[0] -= 1
+        if entry[0]:
+            return
+        await asyncio.sleep(self.delay)
+        if entry[0] or self._roles.get(role.id) is not entry:
+            return
+        del self._roles[role.id]
+        reverting = self._reverting[role.id] = asyncio.ensure_future(
+            role.edit(mentionable=False)
+        )
+        try:
+            await reverting
+        finally:
+            if self._reverting.get(role.id) is reverting:
+                del self._reverting[role.id]
+
+
+class _Mentionable:
+    def __init__(self, roles: MentionableRoles, role: discord.Role):
+        self._roles = roles
+        self._role = role
+
+    async def __aenter__(self):
+        await self._roles._acquire(self._role)
+        return self._role
+
+    async def __aexit__(self, exc_type, exc, tb):
+        await self._roles._release(self._role)
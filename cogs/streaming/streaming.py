@@ -1,10 +1,10 @@
 # -*- coding: utf-8 -*-
+import discord
 from discord.ext import commands
 from discord.webhook import Webhook, AsyncWebhookAdapter
 from discord.channel import TextChannel
 
 import asyncio
-import aiohttp
 import peony
 
 import logging
@@ -13,10 +13,16 @@ import requests.packages.urllib3 as urllib3
 
 from core.config import Config
 from core import checks
+from .delivery import MentionableRoles, WebhookDelivery
 from .embeds import prepare_embed
 
 ReadTimeoutError = urllib3.exceptions.ReadTimeoutError
 
+#: Connections kept open to Discord for sending webhooks.
+WEBHOOK_CONNECTIONS = 10
+#: Webhooks sent to at once.
+DELIVERY_CONCURRENCY = 8
+
 log = logging.getLogger("tbv.twitter")
 default_webhook = {
     "url": "",
@@ -35,6 +41,11 @@ class Streaming:
         self._break_loop = False
         self._stream = None
         self._guilds = self.bot.guilds
+        self._session = None
+        # url -> Webhook
+        self._webhooks = {}
+        self._delivery = WebhookDelivery(DELIVERY_CONCURRENCY)
+        self._mentionable = MentionableRoles()
 
         self.conf.register_global(
             auth__consumer_key=None,
@@ -188,13 +199,13 @@ class Streaming:
             token_secret: str
     ):
         """Adds twitter authetication keys to the bot."""
-        await self.conf.auth.consumer_key.set(key)
-        await self.conf.auth.consumer_secret.set(secret)
-        await self.conf.auth.access_token.set(token)
-        await self.conf.auth.access_token_secret.set(token_secret)
+        async with self.conf.transaction():
+            await self.conf.auth.consumer_key.set(key)
+            await self.conf.auth.consumer_secret.set(secret)
+            await self.conf.auth.access_token.set(token)
+            await self.conf.auth.access_token_secret.set(token_secret)
 
     async def _start_stream(self):
-        guilds = await self.conf.all_guilds()
         twitter_ids = []
         webhooks = []
         guilds_data = {}
@@ -210,7 +221,7 @@ class Streaming:
             }
             guilds_data[guild.id] = data
 
-        for guild, guild_data in guilds.items():
+        async for guild, guild_data in self.conf.iter_guilds():
             for ch, ch_data in guild_data["channels"].items():
                 twitter_ids.extend(ch_data.get("followed", []))
                 if ch_data.get("url", ""):
@@ -246,6 +257,22 @@ class Streaming:
         auth = await self.conf.auth()
         self.client = peony.PeonyClient(**auth)
 
+    def _webhook(self, url: str) -> Webhook:
+        """Get the webhook with ``url``, sending through the bot's shared
+        session.
+        """
+        session = self.bot.sessions.get("webhooks", limit_per_host=WEBHOOK_CONNECTIONS)
+        if session is not self._session:
+            # Webhooks of a closed session can't be used anymore.
+            self._session = session
+            self._webhooks.clear()
+        try:
+            return self._webhooks[url]
+        except KeyError:
+            pass
+        wh = self._webhooks[url] = Webhook.from_url(url, adapter=AsyncWebhookAdapter(session))
+        return wh
+
     async def _stop_stream(self):
         if self._stream:
             await self._stream.client.close()
@@ -259,39 +286,40 @@ class Streaming:
     ):
         username = data["user"]["name"]
         icon_url = data["user"]["profile_image_url"]
+        deliveries = []
         for webhook in webhooks:
-            async with aiohttp.ClientSession() as session:
-                if data["user"]["id_str"] not in webhook["ids"]:
+            if data["user"]["id_str"] not in webhook["ids"]:
+                continue
+            guild_id = webhook["guild"]
+            ch_id = webhook["channel"]
+            guild = guilds[guild_id]["guild"]
+            channel = guilds[guild_id]["channels"][ch_id]
+            mention_role = None
+            if webhook["role"]:
+                permissions = channel.permissions_for(guild.me)
+                if not permissions.manage_roles:
                     continue
-                wh = Webhook.from_url(
-                    webhook["url"],
-                    adapter=AsyncWebhookAdapter(session)
-                )
-                guild_id = webhook["guild"]
-                ch_id = webhook["channel"]
-                guild = guilds[guild_id]["guild"]
-                channel = guilds[guild_id]["channels"][ch_id]
-                mention_role = None
-                phrases = await self.conf.guild(guild).phrases()
-                content = ""
-                if webhook["role"]:
-                    permissions = channel.permissions_for(guild.me)
-                    if not permissions.manage_roles:
-                        continue
-                    roles = guild.roles
-                    for role in roles:
-                        if str(role.id) == webhook["role"]:
-                            mention_role = role
-                            break
-                    await mention_role.edit(mentionable=True)
-                    await asyncio.sleep(2)
-                    content = random.choice(phrases).format(mention_role.id)
-                await wh.send(
-                    content,
-                    username=username,
-                    avatar_url=icon_url,
-                    embeds=embeds
-                )
-                if webhook["role"]:
-                    await asyncio.sleep(2)
-                    await mention_role.edit(mentionable=False)
+                mention_role = discord.utils.get(guild.roles, id=int(webhook["role"]))
+                if mention_role is None:
+                    log.warning(f"Mention role {webhook['role']} of channel {ch_id} not found")
+                    continue
+            send = self._delivery_for(
+                self._webhook(webhook["url"]), guild, mention_role,
+                username=username, avatar_url=icon_url, embeds=embeds
+            )
+            deliveries.append((webhook["url"], send))
+        await self._delivery.fan_out(deliveries)
+
+    def _delivery_for(self, wh, guild, mention_role, **kwargs):
+        async def send(bounded):
+            if mention_role is None:
+                await bounded(wh.send("", **kwargs))
+                return
+            phrases = await self.conf.guild(guild).phrases()
+            content = random.choice(phrases).format(mention_role.id)
+            # Waiting for the role to become mentionable and back doesn't
+            # count towards the concurrency limit.
+            async with self._mentionable.mentionable(mention_role):
+                await bounded(wh.send(content, **kwargs))
+
+        return send
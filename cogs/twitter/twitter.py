@@ -8,7 +8,7 @@ from discord.ext.commands import BucketType
 from core.config import Config
 from core import checks
 from cogs.streaming.embeds import prepare_embed
-from core.utils.chat_formatting import box
+from core.utils.chat_formatting import box, pagify
 
 
 class Twitter:
@@ -106,8 +106,9 @@ class Twitter:
 
         if keyword not in desc:
             desc[keyword] = description
-        await self.conf.guild(ctx.guild).tweets.set(tweets)
-        await self.conf.guild(ctx.guild).descriptions.set(desc)
+        async with self.conf.transaction():
+            await self.conf.guild(ctx.guild).tweets.set(tweets)
+            await self.conf.guild(ctx.guild).descriptions.set(desc)
         await self._update_tweets(id_)
 
     @tweet.command(name="remove")
@@ -147,8 +148,9 @@ class Twitter:
             if not tweets[keyword]:
                 del tweets[keyword]
                 del desc[keyword]
-        await self.conf.guild(ctx.guild).tweets.set(tweets)
-        await self.conf.guild(ctx.guild).descriptions.set(desc)
+        async with self.conf.transaction():
+            await self.conf.guild(ctx.guild).tweets.set(tweets)
+            await self.conf.guild(ctx.guild).descriptions.set(desc)
 
     @tweet.command(name="list")
     @commands.guild_only()
@@ -159,10 +161,9 @@ class Twitter:
         key_str = "Keyword"
         desc_str = "Description"
         lang = f"{key_str:<20}{desc_str}"
-        message = ""
-        for key, desc in descriptions.items():
-            message += f"{key:<20}{desc}\n"
-        await ctx.send(box(message, lang=lang))
+        lines = (f"{key:<20}{desc}" for key, desc in descriptions.items())
+        for page in list(pagify(lines, page_length=2000 - len(lang))) or [""]:
+            await ctx.send(box(page, lang=lang))
 
     @tweet.command(name="accounts")
     @commands.guild_only()
@@ -171,10 +172,8 @@ class Twitter:
         """Lists followed accounts."""
         accounts = await self.conf.guild(ctx.guild).accounts()
         lang = f"Following accounts:"
-        message = ""
-        for acc in accounts:
-            message += f"{acc}\n"
-        await ctx.send(box(message, lang=lang))
+        for page in list(pagify(accounts, page_length=2000 - len(lang))) or [""]:
+            await ctx.send(box(page, lang=lang))
 
     @tweet.command(name="adduser")
     @commands.guild_only()
@@ -249,8 +248,7 @@ class Twitter:
         self.client = peony.PeonyClient(**auth)
 
     async def _load_tweets(self):
-        guilds = await self.conf.all_guilds()
-        for guild, guild_data in guilds.items():
+        async for guild, guild_data in self.conf.iter_guilds():
             guild_tweets = guild_data["tweets"].values()
             for statuses in guild_tweets:
                 for status in statuses:
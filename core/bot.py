@@ -12,8 +12,13 @@ import discord
 from discord.ext.commands import Bot
 from discord.ext.commands import when_mentioned_or
 
+from .caches import GuildSettingsCache, PermissionCache
+from .checks import CheckTimings
 from .config import Config
-from .help_formatter import Help, help as help_
+from .sessions import SessionRegistry
+from .utils.command_index import CommandIndex
+from .utils.json_driver import flush_all
+from .help_formatter import Help, HelpCache, help as help_
 
 log = logging.getLogger("tbv")
 
@@ -44,19 +49,28 @@ class TheBotVanished(Bot):
 
         self.conf.register_user(embeds=None)
         self.uptime = None
+        self.settings_cache = GuildSettingsCache(self)
+        self.permission_cache = PermissionCache(self)
+        self.check_timings = CheckTimings()
+        # Time taken to find out whether commands are visible, e.g. for help.
+        self.visibility_timings = CheckTimings()
+        self.help_cache = HelpCache()
+        self.command_index = CommandIndex(self)
+        self.sessions = SessionRegistry()
+        self.conf.help.subscribe(self.help_cache.clear)
+        self.conf.color.subscribe(self.help_cache.clear)
+        self.conf.on_change(Config.GUILD, self._on_guild_settings_change)
 
         async def prefix_manager(bot, message):
-            global_prefix = await bot.conf.prefix()
             if message.guild is None:
-                return global_prefix
-            server_prefix = await bot.conf.guild(message.guild).prefix()
-            return (
-                when_mentioned_or(*server_prefix)(bot, message)
-                if server_prefix
-                else when_mentioned_or(*global_prefix)(bot, message)
-            )
-
-        if "command_prefix" not in kwargs:
+                global_settings = await bot.settings_cache.get_global()
+                return list(global_settings.prefixes)
+            settings = await bot.settings_cache.get(message.guild)
+            return when_mentioned_or(*settings.prefixes)(bot, message)
+
+        # Messages are only filtered by prefix if the prefixes are known.
+        self._filter_prefixes = "command_prefix" not in kwargs
+        if self._filter_prefixes:
             kwargs["command_prefix"] = prefix_manager
 
         if "owner_id" not in kwargs:
@@ -73,17 +87,58 @@ class TheBotVanished(Bot):
         self.remove_command("help")
         self.add_command(help_)
 
+    async def logout(self):
+        await flush_all()
+        await self.sessions.close()
+        await super().logout()
+
+    def _on_guild_settings_change(self, identifiers, value):
+        # Help embeds are coloured by this setting.
+        if len(identifiers) < 3 or identifiers[2] == "use_bot_color":
+            self.help_cache.clear()
+
+    def add_cog(self, cog):
+        super().add_cog(cog)
+        self.help_cache.clear()
+
+    def remove_cog(self, name):
+        super().remove_cog(name)
+        self.help_cache.clear()
+
+    def add_command(self, command):
+        super().add_command(command)
+        self.help_cache.clear()
+        self.command_index.invalidate()
+
+    def remove_command(self, name):
+        command = super().remove_command(name)
+        self.help_cache.clear()
+        self.command_index.invalidate()
+        return command
+
+    async def process_commands(self, message):
+        """Process the commands in a message.
+
+        Messages which don't start with a prefix are dropped without
+        creating a Context.
+        """
+        if self._filter_prefixes:
+            if message.guild is None:
+                settings = await self.settings_cache.get_global()
+            else:
+                settings = await self.settings_cache.get(message.guild)
+            if not settings.prefix_matcher.matches(message.content):
+                return
+        await super().process_commands(message)
+
     async def _get_owner(self, indict):
         indict["owner_id"] = await self.conf.owner()
 
     async def is_admin(self, member: discord.Member):
-        admin_role = await self.conf.guild(member.guild).admin_role()
-        return any(role.id == admin_role for role in member.roles)
+        return await self.permission_cache.is_admin(member)
 
     async def is_mod(self, member: discord.Member):
-        mod_role = await self.conf.guild(member.guild).mod_role()
-        admin_role = await self.conf.guild(member.guild).admin_role()
-        return any(role.id in (admin_role, mod_role) for role in member.roles)
+        return await self.permission_cache.is_mod(member)
 
     async def embed_requested(self, channel, user, command=None) -> bool:
         """
@@ -106,12 +161,11 @@ class TheBotVanished(Bot):
         if isinstance(channel, discord.abc.PrivateChannel) or (
             command and command == self.get_command("help")
         ):
-            user_setting = await self.conf.user(user).embeds()
+            user_setting = await self.conf.user(user).embeds.view()
             if user_setting is not None:
                 return user_setting
         else:
-            guild_setting = await self.conf.guild(channel.guild).embeds()
-            if guild_setting is not None:
-                return guild_setting
-        global_setting = await self.conf.embeds()
-        return global_setting
+            settings = await self.settings_cache.get(channel.guild)
+            return settings.embeds
+        global_settings = await self.settings_cache.get_global()
+        return global_settings.embeds
@@ -0,0 +1,331 @@
+import asyncio
+import logging
+from collections import namedtuple
+from enum import IntEnum
+
+import discord
+
+from .config import Config
+
+__all__ = [
+    "GlobalSettings",
+    "GuildSettings",
+    "GuildSettingsCache",
+    "PermissionCache",
+    "PermissionLevel",
+    "PrefixMatcher",
+]
+
+log = logging.getLogger("tbv.caches")
+
+
+class PrefixMatcher:
+    """Tells whether a message starts with a command prefix, without
+    creating a Context.
+
+    Most messages start with none of the first characters of the prefixes,
+    and are rejected by a single set lookup.
+
+    Parameters
+    ----------
+    prefixes : `iterable` of `str`
+        The command prefixes.
+    user_id : int, optional
+        ID of the bot user. If given, mentions of the bot count as prefixes.
+
+    """
+
+    __slots__ = ("prefixes", "_first_chars", "_match_all")
+
+    def __init__(self, prefixes, user_id: int = None):
+        prefixes = tuple(prefixes)
+        if user_id is not None:
+            prefixes += (f"<@{user_id}> ", f"<@!{user_id}> ")
+        self.prefixes = prefixes
+        self._first_chars = frozenset(p[0] for p in prefixes if p)
+        self._match_all = "" in prefixes
+
+    def matches(self, content: str) -> bool:
+        if self._match_all:
+            return True
+        return content[:1] in self._first_chars and content.startswith(self.prefixes)
+
+
+GlobalSettings = namedtuple("GlobalSettings", "prefixes embeds prefix_matcher")
+
+
+class GuildSettings(
+    namedtuple(
+        "GuildSettings",
+        "prefixes admin_role mod_role disabled_channels embeds locked_channels "
+        "prefix_matcher"
+    )
+):
+    """Immutable snapshot of the settings of a guild which are needed to
+    handle a message.
+
+    Attributes
+    ----------
+    prefixes : `tuple` of `str`
+        The prefixes of the guild, or the global ones if it has none.
+    admin_role : int
+        ID of the admin role, :code:`None` if not set.
+    mod_role : int
+        ID of the mod role, :code:`None` if not set.
+    disabled_channels : `frozenset` of `int`
+        IDs of channels in which only mods may use commands.
+    embeds : bool
+        Whether embeds are requested in the guild, falling back to the
+        global setting.
+    locked_channels : `frozenset` of `int`
+        IDs of channels locked by the Mod cog. Empty if it isn't loaded.
+    prefix_matcher : `PrefixMatcher`
+        Matches ``prefixes`` and mentions of the bot.
+
+    """
+
+    __slots__ = ()
+
+    def role_level(self, role_ids) -> "PermissionLevel":
+        """Get the permission level given by the roles with ``role_ids``."""
+        if self.admin_role is not None and self.admin_role in role_ids:
+            return PermissionLevel.ADMIN
+        if self.mod_role is not None and self.mod_role in role_ids:
+            return PermissionLevel.MOD
+        return PermissionLevel.NONE
+
+
+class GuildSettingsCache:
+    """Cache of `GuildSettings`, so handling a message doesn't read config.
+
+    A guild's snapshot is built on first use and dropped whenever its
+    settings change, which is found out through `Config.on_change`.
+
+    Cogs can contribute data from their own config with
+    `register_provider`, and must call `invalidate` when it changes.
+
+    Parameters
+    ----------
+    bot : `TheBotVanished`
+        The bot whose settings are cached.
+
+    """
+
+    def __init__(self, bot):
+        self.bot = bot
+        self._global = None
+        self._guilds = {}
+        self._building = {}
+        self._providers = {}
+        # Bumped by every invalidation, so a snapshot which was being built
+        # meanwhile isn't stored.
+        self._epoch = 0
+        self.messages = 0
+        self.config_reads = 0
+        bot.conf.on_change(Config.GLOBAL, self._on_global_change)
+        bot.conf.on_change(Config.GUILD, self._on_guild_change)
+
+    def register_provider(self, field: str, provider):
+        """Fill a field of `GuildSettings` from a cog's config.
+
+        Parameters
+        ----------
+        field : str
+            Name of the field, e.g. ``"locked_channels"``.
+        provider
+            Coroutine function which takes a guild and returns the value of
+            the field. It must call `count_reads` for the config reads it
+            makes.
+
+        """
+        if field not in GuildSettings._fields:
+            raise ValueError("'{}' is not a field of GuildSettings.".format(field))
+        self._providers[field] = provider
+        self.invalidate()
+
+    def unregister_provider(self, field: str):
+        self._providers.pop(field, None)
+        self.invalidate()
+
+    def invalidate(self, guild_id: int = None):
+        """Drop the snapshot of a guild, or of every guild."""
+        self._epoch += 1
+        if guild_id is None:
+            self._guilds.clear()
+            self._building.clear()
+        else:
+            self._guilds.pop(guild_id, None)
+            self._building.pop(guild_id, None)
+
+    def _on_global_change(self, identifiers, value):
+        self._global = None
+        self.invalidate()
+
+    def _on_guild_change(self, identifiers, value):
+        if len(identifiers) > 1:
+            self.invalidate(int(identifiers[1]))
+        else:
+            self.invalidate()
+
+    async def get_global(self) -> GlobalSettings:
+        settings = self._global
+        if settings is None:
+            epoch = self._epoch
+            data = await self.bot.conf.view_all()
+            self.config_reads += 1
+            prefixes = tuple(data["prefix"])
+            # Direct messages need no mention to invoke commands.
+            settings = GlobalSettings(prefixes, data["embeds"], PrefixMatcher(prefixes))
+            if epoch == self._epoch:
+                self._global = settings
+        return settings
+
+    async def get(self, guild: discord.Guild) -> GuildSettings:
+        """Get the snapshot of a guild's settings."""
+        try:
+            return self._guilds[guild.id]
+        except KeyError:
+            pass
+        building = self._building.get(guild.id)
+        if building is None:
+            building = self._building[guild.id] = asyncio.ensure_future(self._build(guild))
+        return await asyncio.shield(building)
+
+    async def _build(self, guild: discord.Guild) -> GuildSettings:
+        epoch = self._epoch
+        try:
+            global_settings = await self.get_global()
+            data = await self.bot.conf.guild(guild).view_all()
+            self.config_reads += 1
+            fields = {
+                "prefixes": tuple(data["prefix"]) or global_settings.prefixes,
+                "admin_role": data["admin_role"],
+                "mod_role": data["mod_role"],
+                "disabled_channels": frozenset(data["disabled_channels"]),
+                "embeds": global_settings.embeds if data["embeds"] is None else data["embeds"],
+                "locked_channels": frozenset(),
+            }
+            for field, provider in list(self._providers.items()):
+                fields[field] = await provider(guild)
+            user = self.bot.user
+            fields["prefix_matcher"] = PrefixMatcher(
+                fields["prefixes"], user.id if user is not None else None
+            )
+            settings = GuildSettings(**fields)
+        finally:
+            if epoch == self._epoch:
+                self._building.pop(guild.id, None)
+        if epoch == self._epoch:
+            self._guilds[guild.id] = settings
+        return settings
+
+    def count_reads(self, reads: int = 1):
+        """Count config reads made to build a snapshot for `stats`."""
+        self.config_reads += reads
+
+    def count_message(self):
+        """Count a message handled by the bot for `stats`."""
+        self.messages += 1
+
+    def stats(self) -> dict:
+        """Get the number of config reads made per handled message.
+
+        Returns
+        -------
+        dict
+            The number of messages, config reads and cached guilds.
+
+        """
+        return {
+            "messages": self.messages,
+            "config_reads": self.config_reads,
+            "reads_per_message": self.config_reads / self.messages if self.messages else 0.0,
+            "cached_guilds": len(self._guilds),
+        }
+
+
+class PermissionLevel(IntEnum):
+    """Permission levels of members, each including the ones below it."""
+
+    NONE = 0
+    MOD = 1
+    ADMIN = 2
+    GUILD_OWNER = 3
+    BOT_OWNER = 4
+
+
+class PermissionCache:
+    """Cache of the `PermissionLevel` of guild members.
+
+    A member's level is resolved once from the bot owner, the guild owner
+    and the admin and mod roles, then kept until their roles, the guild's
+    roles or its admin or mod role setting change.
+
+    Parameters
+    ----------
+    bot : `TheBotVanished`
+        The bot whose permissions are cached.
+
+    """
+
+    def __init__(self, bot):
+        self.bot = bot
+        # guild id -> member id -> level
+        self._levels = {}
+        self._epoch = 0
+        bot.conf.on_change(Config.GUILD, self._on_guild_change)
+
+    def invalidate(self, guild_id: int = None, member_id: int = None):
+        """Drop the level of a member, of every member of a guild, or of
+        everyone.
+        """
+        self._epoch += 1
+        if guild_id is None:
+            self._levels.clear()
+        elif member_id is None:
+            self._levels.pop(guild_id, None)
+        else:
+            self._levels.get(guild_id, {}).pop(member_id, None)
+
+    def _on_guild_change(self, identifiers, value):
+        if len(identifiers) == 1:
+            self.invalidate()
+        elif len(identifiers) == 2 or identifiers[2] in ("admin_role", "mod_role"):
+            self.invalidate(int(identifiers[1]))
+
+    async def level(self, member) -> PermissionLevel:
+        """Get the permission level of a member.
+
+        Users who aren't guild members, e.g. in direct messages, can only be
+        the bot owner.
+        """
+        if not isinstance(member, discord.Member):
+            if await self.bot.is_owner(member):
+                return PermissionLevel.BOT_OWNER
+            return PermissionLevel.NONE
+        levels = self._levels.get(member.guild.id)
+        if levels is not None:
+            try:
+                return levels[member.id]
+            except KeyError:
+                pass
+        epoch = self._epoch
+        level = await self._resolve(member)
+        if epoch == self._epoch:
+            self._levels.setdefault(member.guild.id, {})[member.id] = level
+        return level
+
+    async def _resolve(self, member: discord.Member) -> PermissionLevel:
+        if await self.bot.is_owner(member):
+            return PermissionLevel.BOT_OWNER
+        guild = member.guild
+        if member.id == guild.owner_id:
+            return PermissionLevel.GUILD_OWNER
+        settings = await self.bot.settings_cache.get(guild)
+        return settings.role_level({role.id for role in member.roles})
+
+    async def is_mod(self, member) -> bool:
+        return await self.level(member) >= PermissionLevel.MOD
+
+    async def is_admin(self, member) -> bool:
+        return await self.level(member) >= PermissionLevel.ADMIN
@@ -1,9 +1,182 @@
-import discord
+import asyncio
+import copy
+import time
+
 from discord.ext import commands
 
 
+class CheckTimings:
+    """Time spent evaluating the checks of each command."""
+
+    def __init__(self):
+        # qualified command name -> [number of runs, total seconds]
+        self._timings = {}
+
+    def record(self, command_name: str, elapsed: float):
+        timing = self._timings.get(command_name)
+        if timing is None:
+            self._timings[command_name] = [1, elapsed]
+        else:
+            timing[0] += 1
+            timing[1] += elapsed
+
+    def stats(self) -> dict:
+        """Get the timings of every command whose checks have run.
+
+        Returns
+        -------
+        dict
+            Maps qualified command names to the number of check runs and
+            their total and mean time in seconds.
+
+        """
+        return {
+            name: {"runs": runs, "total": total, "mean": total / runs}
+            for name, (runs, total) in self._timings.items()
+        }
+
+    def reset(self):
+        self._timings.clear()
+
+
+def _memo(ctx) -> dict:
+    """Get the results of checks evaluated for this invocation.
+
+    They are kept on the Context, so checks of a command and of its parents
+    share them.
+    """
+    memo = getattr(ctx, "_check_memo", None)
+    if memo is None:
+        memo = ctx._check_memo = {}
+    return memo
+
+
+async def _memoised(ctx, key, func):
+    """Evaluate ``func`` at most once per invocation.
+
+    Checks evaluated concurrently wait for the same evaluation.
+    """
+    memo = _memo(ctx)
+    try:
+        ret = memo[key]
+    except KeyError:
+        ret = memo[key] = asyncio.ensure_future(func())
+    if isinstance(ret, asyncio.Future):
+        ret = await asyncio.shield(ret)
+        memo[key] = ret
+    return ret
+
+
+class VisibilityResolver:
+    """Finds out which commands the invoker of a Context can use.
+
+    The checks of all commands are evaluated concurrently. Each command is
+    checked with its own copy of the Context, as `commands.Command.can_run`
+    swaps ``ctx.command``, but the copies share the results of memoised
+    checks. A parent's checks are evaluated once for all its subcommands,
+    and hidden parents hide their subcommands without evaluating anything.
+
+    Parameters
+    ----------
+    ctx : `commands.Context`
+        The context commands are checked for.
+    show_hidden : bool
+        Whether hidden commands count as visible.
+
+    Attributes
+    ----------
+    timings : dict
+        Maps qualified command names to the seconds their own checks took.
+        They are also recorded in the bot's ``visibility_timings``.
+
+    """
+
+    def __init__(self, ctx, *, show_hidden: bool = False):
+        self.ctx = ctx
+        self.show_hidden = show_hidden
+        self.timings = {}
+        # command -> future of its visibility
+        self._results = {}
+        # Create the memo before copying the context, so copies share it.
+        _memo(ctx)
+
+    def assume_visible(self, command):
+        """Treat ``command`` as visible without checking it, e.g. because it's
+        the group help is shown for.
+        """
+        future = asyncio.get_event_loop().create_future()
+        future.set_result(True)
+        self._results[command] = future
+
+    def visible(self, command):
+        """Get an awaitable telling whether ``command`` and its parents are
+        visible.
+        """
+        future = self._results.get(command)
+        if future is None:
+            future = self._results[command] = asyncio.ensure_future(self._resolve(command))
+        return future
+
+    async def filter(self, cmds) -> list:
+        """Get the visible commands of ``cmds``, in order."""
+        cmds = list(cmds)
+        visible = await asyncio.gather(*(self.visible(command) for command in cmds))
+        return [command for command, ok in zip(cmds, visible) if ok]
+
+    async def _resolve(self, command) -> bool:
+        if not self.show_hidden and command.hidden:
+            return False
+        parent = command.parent
+        if parent is None:
+            return await self._can_run(command)
+        own = asyncio.ensure_future(self._can_run(command))
+        try:
+            parent_visible = await self.visible(parent)
+        except BaseException:
+            own.cancel()
+            raise
+        if not parent_visible:
+            own.cancel()
+            return False
+        return await own
+
+    async def _can_run(self, command) -> bool:
+        ctx = copy.copy(self.ctx)
+        ctx.command = command
+        start = time.perf_counter()
+        try:
+            return await command.can_run(ctx)
+        except commands.CommandError:
+            return False
+        finally:
+            elapsed = self.timings[command.qualified_name] = time.perf_counter() - start
+            timings = getattr(ctx.bot, "visibility_timings", None)
+            if timings is not None:
+                timings.record(command.qualified_name, elapsed)
+
+
+def _check(predicate):
+    """Same as `commands.check`, also recording how long ``predicate`` takes
+    in the bot's `CheckTimings`.
+    """
+    async def timed(ctx):
+        start = time.perf_counter()
+        try:
+            return await predicate(ctx)
+        finally:
+            timings = getattr(ctx.bot, "check_timings", None)
+            if timings is not None and ctx.command is not None:
+                timings.record(ctx.command.qualified_name, time.perf_counter() - start)
+
+    return commands.check(timed)
+
+
+async def _is_owner(ctx):
+    return await _memoised(ctx, "owner", lambda: ctx.bot.is_owner(ctx.author))
+
+
 async def check_overrides(ctx, *, level):
-    if await ctx.bot.is_owner(ctx.author):
+    if await _is_owner(ctx):
         return True
     perm_cog = ctx.bot.get_cog("Permissions")
     if not perm_cog or ctx.cog == perm_cog:
@@ -11,24 +184,33 @@ async def check_overrides(ctx, *, level):
     # don't break if someone loaded a cog named
     # permissions that doesn't implement this
     func = getattr(perm_cog, "check_overrides", None)
-    val = None if func is None else await func(ctx, level)
-    return val
+    if func is None:
+        return None
+    command = ctx.command.qualified_name if ctx.command is not None else None
+    return await _memoised(ctx, ("override", level, command), lambda: func(ctx, level))
 
 
 def is_owner(**kwargs):
     async def check(ctx):
         override = await check_overrides(ctx, level="owner")
-        return override if override is not None else await ctx.bot.is_owner(ctx.author, **kwargs)
+        if override is not None:
+            return override
+        if kwargs:
+            return await ctx.bot.is_owner(ctx.author, **kwargs)
+        return await _is_owner(ctx)
 
-    return commands.check(check)
+    return _check(check)
 
 
 async def check_permissions(ctx, perms):
-    if await ctx.bot.is_owner(ctx.author):
+    if await _is_owner(ctx):
         return True
     elif not perms:
         return False
-    resolved = ctx.channel.permissions_for(ctx.author)
+    memo = _memo(ctx)
+    resolved = memo.get("permissions")
+    if resolved is None:
+        resolved = memo["permissions"] = ctx.channel.permissions_for(ctx.author)
 
     return resolved.administrator or all(
         getattr(resolved, name, None) == value for name, value in perms.items()
@@ -36,39 +218,11 @@ async def check_permissions(ctx, perms):
 
 
 async def is_mod_or_superior(ctx):
-    if ctx.guild is None:
-        return await ctx.bot.is_owner(ctx.author)
-    else:
-        author = ctx.author
-        settings = ctx.bot.conf.guild(ctx.guild)
-        mod_role_id = await settings.mod_role()
-        admin_role_id = await settings.admin_role()
-
-        mod_role = discord.utils.get(ctx.guild.roles, id=mod_role_id)
-        admin_role = discord.utils.get(ctx.guild.roles, id=admin_role_id)
-
-        return (
-            await ctx.bot.is_owner(ctx.author)
-            or mod_role in author.roles
-            or admin_role in author.roles
-            or author == ctx.guild.owner
-        )
+    return await _memoised(ctx, "mod", lambda: ctx.bot.permission_cache.is_mod(ctx.author))
 
 
 async def is_admin_or_superior(ctx):
-    if ctx.guild is None:
-        return await ctx.bot.is_owner(ctx.author)
-    else:
-        author = ctx.author
-        settings = ctx.bot.conf.guild(ctx.guild)
-        admin_role_id = await settings.admin_role()
-        admin_role = discord.utils.get(ctx.guild.roles, id=admin_role_id)
-
-        return (
-            await ctx.bot.is_owner(ctx.author)
-            or admin_role in author.roles
-            or author == ctx.guild.owner
-        )
+    return await _memoised(ctx, "admin", lambda: ctx.bot.permission_cache.is_admin(ctx.author))
 
 
 def mod_or_permissions(**perms):
@@ -80,7 +234,7 @@ def mod_or_permissions(**perms):
             else await check_permissions(ctx, perms) or await is_mod_or_superior(ctx)
         )
 
-    return commands.check(predicate)
+    return _check(predicate)
 
 
 def admin_or_permissions(**perms):
@@ -92,14 +246,14 @@ def admin_or_permissions(**perms):
             else await check_permissions(ctx, perms) or await is_admin_or_superior(ctx)
         )
 
-    return commands.check(predicate)
+    return _check(predicate)
 
 
 def bot_in_a_guild(**kwargs):
     async def predicate(ctx):
         return len(ctx.bot.guilds) > 0
 
-    return commands.check(predicate)
+    return _check(predicate)
 
 
 def guildowner_or_permissions(**perms):
@@ -112,7 +266,7 @@ def guildowner_or_permissions(**perms):
         override = await check_overrides(ctx, level="guildowner")
         return override if override is not None else is_guild_owner or has_perms_or_is_owner
 
-    return commands.check(predicate)
+    return _check(predicate)
 
 
 def guildowner():
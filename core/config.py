@@ -1,10 +1,16 @@
+import asyncio
 import logging
+from collections import OrderedDict
+from collections.abc import Mapping
 from copy import deepcopy
 import discord
-from typing import Union, Tuple
+from typing import AsyncIterator, Union, Tuple
 
-from .data_manager import core_data_path, cog_data_path
-from .utils.json_driver import JSON
+from .data_manager import core_data_path, cog_data_path, storage_details
+from .json_io import get_codec
+from .utils.json_driver import JSON, ShardedJSON
+from .utils.sqlite_driver import SQLite
+from .utils.frozen import FrozenDict, freeze, thaw
 
 log = logging.getLogger("tbv.config")
 
@@ -21,9 +27,12 @@ class _ValueCtxManager:
     context manager.
     """
 
-    def __init__(self, value_obj, coro):
+    __slots__ = ("value_obj", "coro", "default", "raw_value", "__original_value")
+
+    def __init__(self, value_obj, coro, default=None):
         self.value_obj = value_obj
         self.coro = coro
+        self.default = default
         self.raw_value = None
         self.__original_value = None
 
@@ -31,8 +40,11 @@ class _ValueCtxManager:
         return self.coro.__await__()
 
     async def __aenter__(self):
-        self.raw_value = await self
-        self.__original_value = deepcopy(self.raw_value)
+        # The read-only view serves as the original value, so only the
+        # working copy has to be made.
+        self.coro.close()
+        self.__original_value = await self.value_obj.view(self.default)
+        self.raw_value = thaw(self.__original_value)
         if not isinstance(self.raw_value, (list, dict)):
             raise TypeError(
                 "Type of retrieved value must be mutable (i.e. "
@@ -61,21 +73,21 @@ class Value:
 
     """
 
+    __slots__ = ("identifiers", "default", "driver")
+
     def __init__(self, identifiers: Tuple[str], default_value, driver):
-        self._identifiers = identifiers
+        self.identifiers = tuple(str(i) for i in identifiers)
         self.default = default_value
 
         self.driver = driver
 
-    @property
-    def identifiers(self):
-        return tuple(str(i) for i in self._identifiers)
-
     async def _get(self, default):
         try:
             ret = await self.driver.get(*self.identifiers)
         except KeyError:
-            return default if default is not None else self.default
+            # Registered defaults are shared between accessors, so the caller
+            # must get its own copy.
+            return default if default is not None else deepcopy(self.default)
         return ret
 
     def __call__(self, default=None):
@@ -121,7 +133,27 @@ class Value:
             with` syntax, on gets the value on entrance, and sets it on exit.
 
         """
-        return _ValueCtxManager(self, self._get(default))
+        return _ValueCtxManager(self, self._get(default), default)
+
+    async def view(self, default=None):
+        """Get a read-only view of this data element.
+
+        Unlike calling the `Value`, this does not copy the stored data, so it
+        is the preferred way to read config in frequently run code. Lists and
+        dicts are returned as `FrozenList` and `FrozenDict` views, which can
+        be read like the originals but not modified. Use `set` or the
+        context manager to change the value.
+
+        Parameters
+        ----------
+        default : `object`, optional
+            Same as in `__call__`.
+
+        """
+        try:
+            return await self.driver.get(*self.identifiers, frozen=True)
+        except KeyError:
+            return freeze(default if default is not None else self.default)
 
     async def set(self, value):
         """Set the value of the data elements pointed to by `identifiers`.
@@ -150,6 +182,39 @@ class Value:
         """
         await self.driver.clear(*self.identifiers)
 
+    def subscribe(self, callback):
+        """Call ``callback`` whenever this data element changes.
+
+        ``callback`` is called after the change has been made, with the
+        identifiers of the data which was set or cleared and its new value
+        as a read-only view, :code:`None` if it was cleared. Changes of a
+        parent `Group` or of the contents of this element are passed on as
+        well. Changes made in a transaction are passed on once it is
+        committed. If it is rolled back, the restored data is passed on
+        instead, as it may have been read in the meantime.
+
+        Example
+        -------
+        ::
+
+            def on_prefix_change(identifiers, value):
+                prefix_cache.pop(guild.id, None)
+
+            conf.guild(guild).prefix.subscribe(on_prefix_change)
+
+        Parameters
+        ----------
+        callback : callable
+            A function or coroutine function, which must not raise.
+
+        Returns
+        -------
+        callable
+            Call this to unsubscribe.
+
+        """
+        return self.driver.subscribe(self.identifiers, callback)
+
 
 class Group(Value):
     """
@@ -169,14 +234,16 @@ class Group(Value):
 
     """
 
+    __slots__ = ("_defaults", "force_registration", "_children")
+
     def __init__(
         self, identifiers: Tuple[str], defaults: dict, driver, force_registration: bool = False
     ):
         self._defaults = defaults
         self.force_registration = force_registration
-        self.driver = driver
+        self._children = {}
 
-        super().__init__(identifiers, {}, self.driver)
+        super().__init__(identifiers, {}, driver)
 
     @property
     def defaults(self):
@@ -207,24 +274,30 @@ class Group(Value):
             is set to :code:`True`.
 
         """
+        try:
+            return self._children[item]
+        except KeyError:
+            pass
         is_group = self.is_group(item)
         is_value = not is_group and self.is_value(item)
         new_identifiers = self.identifiers + (item,)
         if is_group:
-            return Group(
+            child = Group(
                 identifiers=new_identifiers,
                 defaults=self._defaults[item],
                 driver=self.driver,
                 force_registration=self.force_registration,
             )
         elif is_value:
-            return Value(
+            child = Value(
                 identifiers=new_identifiers, default_value=self._defaults[item], driver=self.driver
             )
         elif self.force_registration:
             raise AttributeError("'{}' is not a valid registered Group or value.".format(item))
         else:
-            return Value(identifiers=new_identifiers, default_value=None, driver=self.driver)
+            child = Value(identifiers=new_identifiers, default_value=None, driver=self.driver)
+        self._children[item] = child
+        return child
 
     def is_group(self, item: str) -> bool:
         """A helper method for `__getattr__`. Most developers will have no need
@@ -324,14 +397,14 @@ class Group(Value):
         path = [str(p) for p in nested_path]
 
         if default is ...:
-            poss_default = self.defaults
+            poss_default = self._defaults
             for ident in path:
                 try:
                     poss_default = poss_default[ident]
                 except KeyError:
                     break
             else:
-                default = poss_default
+                default = deepcopy(poss_default)
 
         try:
             return await self.driver.get(*self.identifiers, *path)
@@ -356,6 +429,21 @@ class Group(Value):
         """
         return self.nested_update(await self())
 
+    async def view_all(self) -> FrozenDict:
+        """Get a read-only view of this group's data.
+
+        Like `all`, registered defaults are mixed in for values which have
+        not yet been set, but nothing is copied.
+
+        Returns
+        -------
+        FrozenDict
+            All of this Group's attributes, resolved as read-only views.
+
+        """
+        data = await self.view()
+        return data.with_defaults(self._defaults)
+
     def nested_update(self, current, defaults=None):
         """Robust updater for nested dictionaries
 
@@ -367,7 +455,7 @@ class Group(Value):
             defaults = self.defaults
 
         for key, value in current.items():
-            if isinstance(value, collections.Mapping):
+            if isinstance(value, Mapping):
                 result = self.nested_update(value, defaults.get(key, {}))
                 defaults[key] = result
             else:
@@ -446,6 +534,9 @@ class Config:
     USER = "USER"
     MEMBER = "MEMBER"
 
+    #: Number of base `Group` objects kept for reuse.
+    group_cache_size = 4096
+
     def __init__(
         self,
         cog_name: str,
@@ -453,6 +544,7 @@ class Config:
         force_registration: bool = False,
         defaults: dict = None,
     ):
+        self._groups = OrderedDict()
         self.cog_name = cog_name
         self.driver = driver
         self.force_registration = force_registration
@@ -498,7 +590,7 @@ class Config:
 
         cog_name = cog_path.stem
 
-        driver = JSON(cog_name, data_path=cog_path)
+        driver = cls._get_driver(cog_name, cog_path)
         conf = cls(
             cog_name=cog_name,
             driver=driver,
@@ -521,7 +613,7 @@ class Config:
         """
         core_path = core_data_path()
 
-        driver = JSON("Core", data_path=core_path)
+        driver = cls._get_driver("Core", core_path)
         conf = cls(
             cog_name="Core",
             driver=driver,
@@ -529,6 +621,101 @@ class Config:
         )
         return conf
 
+    @staticmethod
+    def _get_driver(cog_name: str, data_path):
+        """Create the storage driver described by the basic config's
+        ``STORAGE_DETAILS``.
+
+        ``STORAGE_DETAILS["type"]`` selects the driver, either ``"json"``
+        (the default) or ``"sqlite"``. JSON data is split into a file per
+        guild, channel etc. if ``STORAGE_DETAILS["sharded"]`` is set, with
+        ``STORAGE_DETAILS["memory_budget"]`` limiting how much of it is kept
+        in memory. ``STORAGE_DETAILS["codec"]`` selects the format of JSON
+        data files, either ``"json"`` (the default), ``"binary"`` or
+        ``"snapshot"``, which is loaded lazily. Binary formats are compressed
+        if ``STORAGE_DETAILS["compress"]`` is set.
+        """
+        details = storage_details()
+        storage_type = details.get("type", "json")
+        if storage_type == "sqlite":
+            return SQLite(cog_name, data_path=data_path)
+        elif storage_type != "json":
+            raise RuntimeError("'{}' is an invalid storage type.".format(storage_type))
+        codec = get_codec(details.get("codec", "json"), details.get("compress", False))
+        if details.get("sharded", False):
+            return ShardedJSON(
+                cog_name,
+                data_path=data_path,
+                flush_interval=details.get("flush_interval"),
+                memory_budget=details.get("memory_budget"),
+                codec=codec,
+            )
+        return JSON(
+            cog_name,
+            data_path=data_path,
+            flush_interval=details.get("flush_interval"),
+            journal=details.get("journal", False),
+            journal_max_size=details.get("journal_max_size", 2**20),
+            codec=codec,
+        )
+
+    async def flush(self):
+        """Write any pending changes of this Config to disk.
+
+        Only has an effect in write-behind mode, i.e. when ``flush_interval``
+        is set in ``STORAGE_DETAILS``. Use this when a change must be durable
+        before continuing.
+        """
+        await self.driver.flush()
+
+    def on_change(self, scope: str, callback):
+        """Call ``callback`` whenever data of a scope changes.
+
+        See `Value.subscribe`. ``identifiers[1]`` of a change tells which
+        guild, channel etc. it belongs to.
+
+        Example
+        -------
+        ::
+
+            def on_guild_change(identifiers, value):
+                if len(identifiers) > 1:
+                    guild_cache.pop(int(identifiers[1]), None)
+                else:
+                    guild_cache.clear()
+
+            conf.on_change(Config.GUILD, on_guild_change)
+
+        Returns
+        -------
+        callable
+            Call this to unsubscribe.
+
+        """
+        return self.driver.subscribe((scope,), callback)
+
+    def transaction(self):
+        """Apply several changes atomically with a single write.
+
+        Example
+        -------
+        ::
+
+            async with conf.transaction():
+                await conf.guild(guild).foo.set(1)
+                await conf.guild(guild).bar.set(2)
+
+        Changes made inside the block are visible immediately, but are only
+        written to disk once it exits. If the block raises, the changes are
+        rolled back and nothing is written. Transactions may be nested.
+
+        While the block is open, changes and transactions of other tasks
+        wait for it to exit, so it must not wait for other tasks changing
+        this data.
+
+        """
+        return self.driver.transaction()
+
     def __getattr__(self, item: str) -> Union[Group, Value]:
         """Same as `group.__getattr__` except for global data.
 
@@ -552,13 +739,28 @@ class Config:
         return getattr(global_group, item)
 
     def _get_base_group(self, key: str, *identifiers: str) -> Group:
+        # Groups and their children are reused, so repeated access to the same
+        # scope costs a dict lookup. They share the registered defaults, which
+        # are never handed out without being copied.
+        cache_key = (key, *identifiers)
+        try:
+            group = self._groups[cache_key]
+        except KeyError:
+            pass
+        else:
+            self._groups.move_to_end(cache_key)
+            return group
         # noinspection PyTypeChecker
-        return Group(
-            identifiers=(key, *identifiers),
-            defaults=self.defaults.get(key, {}),
+        group = Group(
+            identifiers=cache_key,
+            defaults=self._defaults.get(key, {}),
             driver=self.driver,
             force_registration=self.force_registration,
         )
+        self._groups[cache_key] = group
+        if len(self._groups) > self.group_cache_size:
+            self._groups.popitem(last=False)
+        return group
 
     @staticmethod
     def _get_defaults_dict(key: str, value) -> dict:
@@ -609,6 +811,7 @@ class Config:
                 _partial[k] = v
 
     def _register_default(self, key: str, **kwargs):
+        self._groups.clear()
         if key not in self._defaults:
             self._defaults[key] = {}
 
@@ -884,7 +1087,118 @@ class Config:
             ret = self._all_members_from_guild(group, guild_data)
         return ret
 
-    async def _clear_scope(self, *scopes: str):
+    async def _scope_keys(self, group: Group) -> list:
+        try:
+            return await self.driver.keys(*group.identifiers)
+        except KeyError:
+            return []
+
+    async def _iter_scope(self, scope: str, *identifiers: str, chunk_size: int):
+        """Iterate over the entries of a scope in chunks.
+
+        Yields ``(key, view)`` pairs, where ``view`` is a `FrozenDict` of the
+        entry with the registered defaults mixed in. Control is given back to
+        the event loop after every chunk.
+        """
+        group = self._get_base_group(scope, *identifiers)
+        keys = await self._scope_keys(group)
+        defaults = self._defaults.get(scope, {})
+        for start in range(0, len(keys), chunk_size):
+            for key in keys[start:start + chunk_size]:
+                try:
+                    data = await self.driver.get(*group.identifiers, key, frozen=True)
+                except KeyError:
+                    # Cleared while iterating.
+                    continue
+                yield key, data.with_defaults(defaults)
+            await asyncio.sleep(0)
+
+    async def iter_guilds(self, chunk_size: int = 100) -> AsyncIterator:
+        """Iterate over all guild data.
+
+        This is the incremental counterpart of `all_guilds`. Entries are
+        fetched ``chunk_size`` at a time, giving other tasks a chance to run
+        in between, and are returned as read-only views with the registered
+        defaults mixed in.
+
+        Example
+        -------
+        ::
+
+            async for guild_id, data in conf.iter_guilds():
+                ...
+
+        Parameters
+        ----------
+        chunk_size : int
+            Number of entries to fetch before yielding to the event loop.
+
+        Yields
+        ------
+        `tuple` of (`int`, `FrozenDict`)
+            :code:`GUILD_ID, data` pairs.
+
+        """
+        async for key, data in self._iter_scope(self.GUILD, chunk_size=chunk_size):
+            yield int(key), data
+
+    async def iter_channels(self, chunk_size: int = 100) -> AsyncIterator:
+        """Iterate over all channel data.
+
+        See `iter_guilds` for details.
+        """
+        async for key, data in self._iter_scope(self.CHANNEL, chunk_size=chunk_size):
+            yield int(key), data
+
+    async def iter_roles(self, chunk_size: int = 100) -> AsyncIterator:
+        """Iterate over all role data.
+
+        See `iter_guilds` for details.
+        """
+        async for key, data in self._iter_scope(self.ROLE, chunk_size=chunk_size):
+            yield int(key), data
+
+    async def iter_users(self, chunk_size: int = 100) -> AsyncIterator:
+        """Iterate over all user data.
+
+        See `iter_guilds` for details.
+        """
+        async for key, data in self._iter_scope(self.USER, chunk_size=chunk_size):
+            yield int(key), data
+
+    async def iter_members(
+        self, guild: discord.Guild = None, chunk_size: int = 100
+    ) -> AsyncIterator:
+        """Iterate over member data.
+
+        See `iter_guilds` for details.
+
+        Parameters
+        ----------
+        guild : `discord.Guild`, optional
+            The guild to iterate over the members of. Omit to iterate over
+            the members of all guilds.
+        chunk_size : int
+            Number of entries to fetch before yielding to the event loop.
+
+        Yields
+        ------
+        `tuple`
+            :code:`MEMBER_ID, data` pairs if ``guild`` is given, otherwise
+            :code:`(GUILD_ID, MEMBER_ID), data` pairs.
+
+        """
+        if guild is not None:
+            members = self._iter_scope(self.MEMBER, guild.id, chunk_size=chunk_size)
+            async for key, data in members:
+                yield int(key), data
+            return
+        for guild_id in await self._scope_keys(self._get_base_group(self.MEMBER)):
+            members = self._iter_scope(self.MEMBER, guild_id, chunk_size=chunk_size)
+            async for key, data in members:
+                yield (int(guild_id), int(key)), data
+
+    async def _clear_scope(self, *scopes: str, chunk_size: int = None):
         """Clear all data in a particular scope.
 
         The only situation where a second scope should be passed in is if
@@ -900,12 +1214,23 @@ class Config:
             of a specific guild.
 
             **Leaving blank removes all data from this Config instance.**
+        chunk_size : `int`, optional
+            If given, entries of the scope are cleared this many at a time,
+            with one write per chunk, giving other tasks a chance to run in
+            between.
 
         """
         if not scopes:
             group = Group(identifiers=[], defaults={}, driver=self.driver)
         else:
             group = self._get_base_group(*scopes)
+        if chunk_size is not None:
+            keys = await self._scope_keys(group)
+            for start in range(0, len(keys), chunk_size):
+                async with self.transaction():
+                    for key in keys[start:start + chunk_size]:
+                        await self.driver.clear(*group.identifiers, key)
+                await asyncio.sleep(0)
         await group.clear()
 
     async def clear_all(self):
@@ -927,35 +1252,39 @@ class Config:
         """
         await self._clear_scope(self.GLOBAL)
 
-    async def clear_all_guilds(self):
+    async def clear_all_guilds(self, chunk_size: int = None):
         """Clear all guild data.
 
-        This resets all guild data to its registered defaults.
+        This resets all guild data to its registered defaults. See
+        `clear_all_members` for ``chunk_size``.
         """
-        await self._clear_scope(self.GUILD)
+        await self._clear_scope(self.GUILD, chunk_size=chunk_size)
 
-    async def clear_all_channels(self):
+    async def clear_all_channels(self, chunk_size: int = None):
         """Clear all channel data.
 
-        This resets all channel data to its registered defaults.
+        This resets all channel data to its registered defaults. See
+        `clear_all_members` for ``chunk_size``.
         """
-        await self._clear_scope(self.CHANNEL)
+        await self._clear_scope(self.CHANNEL, chunk_size=chunk_size)
 
-    async def clear_all_roles(self):
+    async def clear_all_roles(self, chunk_size: int = None):
         """Clear all role data.
 
-        This resets all role data to its registered defaults.
+        This resets all role data to its registered defaults. See
+        `clear_all_members` for ``chunk_size``.
         """
-        await self._clear_scope(self.ROLE)
+        await self._clear_scope(self.ROLE, chunk_size=chunk_size)
 
-    async def clear_all_users(self):
+    async def clear_all_users(self, chunk_size: int = None):
         """Clear all user data.
 
-        This resets all user data to its registered defaults.
+        This resets all user data to its registered defaults. See
+        `clear_all_members` for ``chunk_size``.
         """
-        await self._clear_scope(self.USER)
+        await self._clear_scope(self.USER, chunk_size=chunk_size)
 
-    async def clear_all_members(self, guild: discord.Guild = None):
+    async def clear_all_members(self, guild: discord.Guild = None, chunk_size: int = None):
         """Clear all member data.
 
         This resets all specified member data to its registered defaults.
@@ -965,9 +1294,12 @@ class Config:
         guild : `discord.Guild`, optional
             The guild to clear member data from. Omit to clear member data from
             all guilds.
+        chunk_size : `int`, optional
+            Clear the data this many entries at a time, letting other tasks
+            run in between. Useful for large amounts of data.
 
         """
         if guild is not None:
-            await self._clear_scope(self.MEMBER, guild.id)
+            await self._clear_scope(self.MEMBER, guild.id, chunk_size=chunk_size)
             return
-        await self._clear_scope(self.MEMBER)
+        await self._clear_scope(self.MEMBER, chunk_size=chunk_size)
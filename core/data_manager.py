@@ -52,6 +52,20 @@ def _base_data_path() -> Path:
     return Path(path).resolve()
 
 
+def storage_details() -> dict:
+    """Gets the storage settings from the basic configuration.
+
+    Returns
+    -------
+    dict
+        The ``STORAGE_DETAILS`` section of the basic config. Empty if it has
+        not been set.
+    """
+    if basic_config is None:
+        raise RuntimeError("You must load the basic config before you can get the storage details.")
+    return basic_config.get("STORAGE_DETAILS") or {}
+
+
 def cog_data_path(cog_instance=None) -> Path:
     """Gets the base cog data path. If you want to get the folder with
     which to store your own cog's data please pass in an instance
@@ -10,7 +10,7 @@ from discord.ext import commands
 
 from . import __version__
 from .utils.chat_formatting import bordered, inline
-# from .utils import fuzzy_command_search
+from .utils import fuzzy_command_search
 
 logger = logging.getLogger("tbv")
 
@@ -122,13 +122,10 @@ def init_events(bot):
             bot._last_exception = exception_log
             if not hasattr(ctx.cog, "_{0.command.cog_name}__error".format(ctx)):
                 await ctx.send(inline(message))
-        # elif isinstance(error, commands.CommandNotFound):
-            # term = ctx.invoked_with + " "
-            # if len(ctx.args) > 1:
-            #     term += " ".join(ctx.args[1:])
-            # fuzzy_result = await fuzzy_command_search(ctx, ctx.invoked_with)
-            # if fuzzy_result is not None:
-            #     await ctx.maybe_send_embed(fuzzy_result)
+        elif isinstance(error, commands.CommandNotFound):
+            fuzzy_result = await fuzzy_command_search(ctx, ctx.invoked_with)
+            if fuzzy_result is not None:
+                await ctx.send(fuzzy_result)
         elif isinstance(error, commands.CheckFailure):
             pass
         elif isinstance(error, commands.NoPrivateMessage):
@@ -142,18 +139,41 @@ def init_events(bot):
 
     @bot.event
     async def on_message(message):
+        bot.settings_cache.count_message()
         guild = message.guild
-        channel = message.channel
         author = message.author
-        is_owner = await bot.is_owner(author)
         if guild:
-            is_mod = await bot.is_mod(author)
-        disabled_channels = await bot.conf.guild(guild).disabled_channels()
-        if channel.id in disabled_channels and not (is_mod or is_owner):
-            return
+            settings = await bot.settings_cache.get(guild)
+            if message.channel.id in settings.disabled_channels and not (
+                await bot.permission_cache.is_mod(author)
+            ):
+                return
         await bot.process_commands(message)
 
 
+    @bot.event
+    async def on_member_update(before, after):
+        if before.roles != after.roles:
+            bot.permission_cache.invalidate(after.guild.id, after.id)
+
+    @bot.event
+    async def on_member_remove(member):
+        bot.permission_cache.invalidate(member.guild.id, member.id)
+
+    @bot.event
+    async def on_guild_update(before, after):
+        if before.owner_id != after.owner_id:
+            bot.permission_cache.invalidate(after.id)
+
+    @bot.event
+    async def on_guild_role_update(before, after):
+        bot.permission_cache.invalidate(after.guild.id)
+
+    @bot.event
+    async def on_guild_role_delete(role):
+        bot.permission_cache.invalidate(role.guild.id)
+
+
 def _get_startup_screen_specs():
     """Get specs for displaying the startup screen on stdout.
 
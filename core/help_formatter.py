@@ -1,4 +1,4 @@
-from collections import namedtuple
+from collections import OrderedDict, namedtuple
 from typing import List
 import inspect
 import itertools
@@ -10,6 +10,7 @@ import discord
 from discord.ext import commands
 from discord.ext.commands import formatter
 
+from core.checks import VisibilityResolver
 from core.utils.chat_formatting import pagify, box
 
 EMPTY_STRING = "\u200b"
@@ -21,6 +22,91 @@ _mention_pattern = re.compile("|".join(_mentions_transforms.keys()))
 EmbedField = namedtuple("EmbedField", "name value inline")
 
 
+class HelpCache:
+    """Cache of rendered help pages.
+
+    Pages are keyed by what they show, the prefix they show, the bot's
+    name and colour, everything that decides which commands the invoker
+    can see, and whether they are embeds. The cache is cleared when cogs
+    or commands are added or removed and when help settings change.
+
+    Parameters
+    ----------
+    max_size : int
+        Number of rendered help outputs to keep.
+
+    """
+
+    def __init__(self, max_size: int = 1024):
+        self.max_size = max_size
+        self._pages = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    async def key(self, ctx, command_or_bot, use_embeds: bool):
+        """Get the key of the help for ``command_or_bot`` shown to the
+        invoker of ``ctx``, :code:`None` if it can't be cached.
+        """
+        if command_or_bot is None:
+            return None
+        if command_or_bot is ctx.bot:
+            subject = "bot"
+        elif isinstance(command_or_bot, commands.Command):
+            subject = "command:" + command_or_bot.qualified_name
+        else:
+            subject = "cog:" + type(command_or_bot).__name__
+
+        me = ctx.guild.me if ctx.guild else ctx.bot.user
+        clean_prefix = ctx.prefix.replace(me.mention, f"@{me.display_name}")
+
+        author = ctx.author
+        level = await ctx.bot.permission_cache.level(author)
+        # Pages show the bot's name and may be in its colour.
+        appearance = (me.display_name, me.color.value)
+        if ctx.guild is None:
+            signature = (None, ctx.channel.id, level)
+        else:
+            signature = (
+                ctx.guild.id,
+                ctx.channel.id,
+                level,
+                ctx.channel.permissions_for(author).value,
+                frozenset(role.id for role in getattr(author, "roles", ())),
+                # Commands may check the bot's own permissions.
+                ctx.channel.permissions_for(me).value,
+            )
+        perm_cog = ctx.bot.get_cog("Permissions")
+        func = getattr(perm_cog, "help_signature", None)
+        if func is not None:
+            signature += (func(ctx),)
+        return (subject, clean_prefix, appearance, signature, use_embeds)
+
+    def get(self, key):
+        if key is None:
+            return None
+        try:
+            pages = self._pages[key]
+        except KeyError:
+            self.misses += 1
+            return None
+        self._pages.move_to_end(key)
+        self.hits += 1
+        return pages
+
+    def put(self, key, pages):
+        if key is None:
+            return
+        self._pages[key] = pages
+        if len(self._pages) > self.max_size:
+            self._pages.popitem(last=False)
+
+    def clear(self, *args):
+        """Drop all pages. Takes any arguments, so it can be subscribed to
+        config changes.
+        """
+        self._pages.clear()
+
+
 class Help(formatter.HelpFormatter):
     """Formats help for commands."""
 
@@ -77,8 +163,30 @@ class Help(formatter.HelpFormatter):
         author = {"name": "{0} Help Manual".format(name), "icon_url": self.avatar}
         return author
 
+    async def filter_command_list(self):
+        """Get the ``(name, command)`` pairs to list, checking all commands
+        at once.
+        """
+        if self.is_cog():
+            items = [
+                (name, cmd)
+                for name, cmd in self.context.bot.all_commands.items()
+                if cmd.instance is self.command
+            ]
+        else:
+            items = list(self.command.all_commands.items())
+        if not self.show_hidden:
+            items = [(name, cmd) for name, cmd in items if not cmd.hidden]
+        if self.show_check_failure:
+            return items
+
+        resolver = VisibilityResolver(self.context, show_hidden=self.show_hidden)
+        if isinstance(self.command, commands.Command):
+            resolver.assume_visible(self.command)
+        visible = set(await resolver.filter({cmd for _, cmd in items}))
+        return [(name, cmd) for name, cmd in items if cmd in visible]
+
     def _add_subcommands(self, cmds):
-        entries = ""
         for name, command in cmds:
             if name in command.aliases:
                 # skip aliases
@@ -87,8 +195,7 @@ class Help(formatter.HelpFormatter):
             if self.is_cog() or self.is_bot():
                 name = "{0}{1}".format(self.clean_prefix, name)
 
-            entries += "**{0}**   {1}\n".format(name, command.short_doc)
-        return entries
+            yield "**{0}**   {1}".format(name, command.short_doc)
 
     def get_ending_note(self):
         # command_name = self.context.invoked_with
@@ -297,13 +404,9 @@ async def help(ctx, *cmds: str):
     if ctx.guild and not ctx.channel.permissions_for(ctx.guild.me).embed_links:
         use_embeds = False
     # use_embeds = await ctx.embed_requested()
-    f = formatter.HelpFormatter()
     # help by itself just lists our own commands.
     if len(cmds) == 0:
-        if use_embeds:
-            embeds = await ctx.bot.formatter.format_help_for(ctx, ctx.bot)
-        else:
-            embeds = await f.format_help_for(ctx, ctx.bot)
+        command = ctx.bot
     elif len(cmds) == 1:
         # try to see if it is a cog name
         name = _mention_pattern.sub(repl, cmds[0])
@@ -312,10 +415,6 @@ async def help(ctx, *cmds: str):
             command = ctx.bot.cogs[name]
         else:
             command = ctx.bot.all_commands.get(name)
-        if use_embeds:
-            embeds = await ctx.bot.formatter.format_help_for(ctx, command)
-        else:
-            embeds = await f.format_help_for(ctx, command)
     else:
         name = _mention_pattern.sub(repl, cmds[0])
         command = ctx.bot.all_commands.get(name)
@@ -335,10 +434,16 @@ async def help(ctx, *cmds: str):
                 else:
                     await destination.send(ctx.bot.command_has_no_subcommands.format(command))
                 return
+
+    cache = ctx.bot.help_cache
+    key = await cache.key(ctx, command, use_embeds)
+    embeds = cache.get(key)
+    if embeds is None:
         if use_embeds:
             embeds = await ctx.bot.formatter.format_help_for(ctx, command)
         else:
-            embeds = await f.format_help_for(ctx, command)
+            embeds = await formatter.HelpFormatter().format_help_for(ctx, command)
+        cache.put(key, embeds)
 
     max_pages_in_guild = await ctx.bot.conf.help.max_pages_in_guild()
     if len(embeds) > max_pages_in_guild:
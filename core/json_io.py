@@ -1,40 +1,443 @@
+import concurrent.futures
 import functools
 import logging
 import asyncio
 import json
+import marshal
+import mmap
+import os
+import struct
+import zlib
 from pathlib import Path
 
 log = logging.getLogger("tbv")
 
 PRETTY = {"indent": 4, "sort_keys": True, "separators": (",", " : ")}
 COMPACT = {"sort_keys": True, "separators": (",", ":")}
+# Payloads of binary files aren't meant to be read by humans or diffed.
+_PAYLOAD = {"separators": (",", ":")}
+
+#: Files at least this large are encoded in another process, see `_encode`.
+PROCESS_ENCODE_SIZE = 2**20
+
+_process_pool = None
+
+
+def _dumps(data) -> bytes:
+    return json.dumps(data, **_PAYLOAD).encode("utf-8")
+
+
+def _loads(raw, version: int):
+    # Version 1 files were written with marshal, which is tied to the
+    # Python version; they are only read, to migrate them.
+    if version == 1:
+        return marshal.loads(raw)
+    return json.loads(bytes(raw).decode("utf-8"))
+
+
+class JsonCodec:
+    """Encodes data as JSON text.
+
+    Parameters
+    ----------
+    settings : dict
+        Keyword arguments for `json.dumps`, e.g. `PRETTY` or `COMPACT`.
+
+    """
+
+    name = "json"
+
+    def __init__(self, settings=PRETTY):
+        self.settings = settings
+
+    def encode(self, data) -> bytes:
+        return json.dumps(data, **self.settings).encode("utf-8")
+
+    def decode(self, raw: bytes):
+        return json.loads(raw.decode("utf-8"))
+
+
+class BinaryCodec:
+    """Encodes data in a compact binary format which is faster to load and
+    save than indented JSON, and can be compressed.
+
+    A file starts with a header made of `MAGIC`, a format version byte, a
+    flags byte and the length of the payload as an unsigned 64 bit integer.
+    The payload is the data as compact UTF-8 JSON, so it decodes the same
+    on every Python version and to the same types as the other codecs. It
+    is compressed with `zlib` if the ``FLAG_ZLIB`` flag is set.
+
+    Parameters
+    ----------
+    compress : bool
+        Whether to compress the payload.
+    level : int
+        The zlib compression level. Low levels are nearly as fast as no
+        compression.
+
+    """
+
+    name = "binary"
+
+    MAGIC = b"TBVB"
+    VERSION = 2
+    FLAG_ZLIB = 0x01
+    _header = struct.Struct("<4sBBQ")
+
+    def __init__(self, compress: bool = False, level: int = 1):
+        self.compress = compress
+        self.level = level
+
+    @classmethod
+    def detect(cls, raw: bytes) -> bool:
+        return raw[:len(cls.MAGIC)] == cls.MAGIC
+
+    def encode(self, data) -> bytes:
+        payload = _dumps(data)
+        flags = 0
+        if self.compress:
+            payload = zlib.compress(payload, self.level)
+            flags |= self.FLAG_ZLIB
+        return self._header.pack(self.MAGIC, self.VERSION, flags, len(payload)) + payload
+
+    def decode(self, raw: bytes):
+        magic, version, flags, length = self._header.unpack_from(raw)
+        if magic != self.MAGIC:
+            raise ValueError("Not a binary data file")
+        if version not in (1, self.VERSION):
+            raise ValueError(f"Unsupported binary format version {version}")
+        payload = raw[self._header.size:]
+        if len(payload) != length:
+            raise ValueError("Truncated binary data file")
+        if flags & self.FLAG_ZLIB:
+            payload = zlib.decompress(payload)
+        return _loads(payload, version)
+
+
+class SnapshotCodec:
+    """Encodes data in an indexed binary format which can be read lazily.
+
+    Every scope key, e.g. a single guild of the ``GUILD`` scope, is encoded
+    separately like the payload of `BinaryCodec`. ``GLOBAL`` and empty
+    scopes are encoded as a whole under the key :code:`None`. A file starts
+    with a header made of `MAGIC`, a format version byte, a flags byte and
+    the length of the index, followed by the index and the encoded scope
+    keys. The index is a JSON list of ``[scope, key, offset, length]``
+    entries, so `SnapshotReader` can decode any scope key without touching
+    the rest of the file.
+
+    Parameters
+    ----------
+    compress : bool
+        Whether to compress every scope key.
+    level : int
+        The zlib compression level.
+
+    """
+
+    name = "snapshot"
+
+    MAGIC = b"TBVI"
+    VERSION = 2
+    FLAG_ZLIB = 0x01
+    _header = struct.Struct("<4sBBQ")
+
+    def __init__(self, compress: bool = False, level: int = 1):
+        self.compress = compress
+        self.level = level
+
+    @classmethod
+    def detect(cls, raw: bytes) -> bool:
+        return raw[:len(cls.MAGIC)] == cls.MAGIC
+
+    def encode(self, data) -> bytes:
+        index = []
+        blobs = []
+        offset = 0
+        for scope, value in data.items():
+            if scope == "GLOBAL" or not isinstance(value, dict) or not value:
+                value = {None: value}
+            for key, partial in value.items():
+                blob = _dumps(partial)
+                if self.compress:
+                    blob = zlib.compress(blob, self.level)
+                index.append((scope, key, offset, len(blob)))
+                blobs.append(blob)
+                offset += len(blob)
+        raw_index = _dumps(index)
+        flags = self.FLAG_ZLIB if self.compress else 0
+        header = self._header.pack(self.MAGIC, self.VERSION, flags, len(raw_index))
+        return b"".join([header, raw_index] + blobs)
+
+    def decode(self, raw: bytes):
+        reader = SnapshotReader(raw)
+        data = {}
+        for scope, keys in reader.index.items():
+            if None in keys:
+                data[scope] = reader.read(scope, None)
+            else:
+                data[scope] = {key: reader.read(scope, key) for key in keys}
+        return data
+
+
+class SnapshotReader:
+    """Decodes single scope keys of data encoded by `SnapshotCodec`.
+
+    Parameters
+    ----------
+    buffer
+        The encoded data, e.g. a memory map of a snapshot file.
+    file : optional
+        The file ``buffer`` maps, closed along with the reader.
+
+    Attributes
+    ----------
+    index : dict
+        Maps ``scope -> key -> (offset, length)``.
+
+    """
+
+    def __init__(self, buffer, file=None):
+        self._buffer = buffer
+        self._file = file
+        header = SnapshotCodec._header
+        magic, version, flags, index_length = header.unpack_from(buffer)
+        if magic != SnapshotCodec.MAGIC:
+            raise ValueError("Not a snapshot file")
+        if version not in (1, SnapshotCodec.VERSION):
+            raise ValueError(f"Unsupported snapshot format version {version}")
+        self._version = version
+        self._compressed = bool(flags & SnapshotCodec.FLAG_ZLIB)
+        self._base = header.size + index_length
+        index = _loads(buffer[header.size:self._base], version)
+        if version == 1:
+            self.index = index
+        else:
+            self.index = {}
+            for scope, key, offset, length in index:
+                self.index.setdefault(scope, {})[key] = (offset, length)
+        end = max(
+            (o + n for keys in self.index.values() for o, n in keys.values()),
+            default=0
+        )
+        if self._base + end > len(buffer):
+            raise ValueError("Truncated snapshot file")
+
+    @classmethod
+    def open(cls, path: Path) -> "SnapshotReader":
+        """Memory map a snapshot file, so only the pages of the scope keys
+        which are read are loaded from disk.
+        """
+        f = path.open(mode="rb")
+        try:
+            buffer = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+            return cls(buffer, f)
+        except Exception:
+            f.close()
+            raise
+
+    def read(self, scope: str, key):
+        """Decode a scope key, or a whole scope if ``key`` is :code:`None`."""
+        offset, length = self.index[scope][key]
+        start = self._base + offset
+        raw = self._buffer[start:start + length]
+        if self._compressed:
+            raw = zlib.decompress(raw)
+        return _loads(raw, self._version)
+
+    def close(self):
+        if self._file is not None:
+            self._buffer.close()
+            self._file.close()
+
+
+def get_codec(name: str = "json", compress: bool = False):
+    """Get the codec to save data with.
+
+    Parameters
+    ----------
+    name : str
+        Either ``"json"``, ``"binary"`` or ``"snapshot"``.
+    compress : bool
+        Whether to compress the data. Not supported by the JSON codec.
+
+    """
+    if name == "json":
+        return JsonCodec()
+    if name == "binary":
+        return BinaryCodec(compress=compress)
+    if name == "snapshot":
+        return SnapshotCodec(compress=compress)
+    raise RuntimeError("'{}' is an invalid storage codec.".format(name))
+
+
+def decode(raw: bytes):
+    """Decode data saved with any codec, detecting its format."""
+    if BinaryCodec.detect(raw):
+        return BinaryCodec().decode(raw)
+    if SnapshotCodec.detect(raw):
+        return SnapshotCodec().decode(raw)
+    return JsonCodec().decode(raw)
+
+
+async def _encode(codec, data, size_hint: int) -> bytes:
+    """Encode data without holding up the event loop.
+
+    The C JSON encoder, used for everything but indented JSON, holds the
+    GIL until it is done, so even in a thread it delays the loop by about
+    40 ms per MB. Data expected to be at least `PROCESS_ENCODE_SIZE` bytes
+    is encoded in a worker process instead, and only pickling it costs
+    time in this one. See ``benchmarks/bench_save.py``.
+    """
+    global _process_pool
+    loop = asyncio.get_event_loop()
+    if size_hint >= PROCESS_ENCODE_SIZE:
+        if _process_pool is None:
+            _process_pool = concurrent.futures.ProcessPoolExecutor(max_workers=1)
+        try:
+            return await loop.run_in_executor(_process_pool, codec.encode, data)
+        except concurrent.futures.process.BrokenProcessPool:
+            log.warning("The encoding process died, encoding in a thread")
+            _process_pool = None
+    return await loop.run_in_executor(None, codec.encode, data)
+
 
 class JsonIO:
-    def __init__(self, path: Path):
+    """Loads and saves a data file.
+
+    Despite the name, the file can be saved with any codec: `_load_json`
+    detects the format of the file, so switching codecs takes effect on the
+    next save without migrating anything.
+
+    Parameters
+    ----------
+    path : `pathlib.Path`
+        The data file.
+    codec : optional
+        The codec to save data with, `JsonCodec` with `PRETTY` settings by
+        default.
+
+    """
+
+    def __init__(self, path: Path, codec=None):
         self._lock = asyncio.Lock()
         if path:
             self.path = path
         else:
             raise ValueError("Please specifiy path to json file")
+        self.codec = codec or JsonCodec()
+        self._size = None
+
+    def _write_atomic(self, path: Path, raw: bytes):
+        tmp_path = path.with_name(path.name + ".tmp")
+        with tmp_path.open(mode="wb") as f:
+            f.write(raw)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(str(tmp_path), str(path))
+
+    def _save_json(self, data, settings=None):
+        """Save data to the file.
 
-    def _save_json(self, data, settings=PRETTY):
+        The data is encoded with the codec of this JsonIO, or as JSON with
+        the given ``settings``. It is written to a temporary file first,
+        which then replaces the original, so the file is never left
+        half-written.
+        """
         log.debug(f"Saving file {self.path}")
-        with self.path.open(encoding="utf-8", mode="w") as f:
-            json.dump(data, f, **settings)
+        codec = self.codec if settings is None else JsonCodec(settings)
+        self._write_atomic(self.path, codec.encode(data))
+
+    def _export_json(self, path: Path, data=None, settings=PRETTY):
+        """Save data as JSON to ``path`` for human inspection.
+
+        Exports the contents of the file if ``data`` isn't given.
+        """
+        if data is None:
+            data = self._load_json()
+        log.debug(f"Exporting {self.path} to {path}")
+        self._write_atomic(path, JsonCodec(settings).encode(data))
+
+    async def _threadsafe_save_json(self, data, settings=None):
+        """Like `_save_json`, with ``data`` encoded in another process if
+        the file is large, see `_encode`. ``data`` must not change until
+        this returns.
+        """
+        loop = asyncio.get_event_loop()
+        codec = self.codec if settings is None else JsonCodec(settings)
+        with await self._lock:
+            if self._size is None:
+                try:
+                    self._size = self.path.stat().st_size
+                except FileNotFoundError:
+                    self._size = 0
+            raw = await _encode(codec, data, self._size)
+            log.debug(f"Saving file {self.path}")
+            await loop.run_in_executor(None, self._write_atomic, self.path, raw)
+            self._size = len(raw)
+
+    def _append_json_lines(self, records, settings=COMPACT):
+        """Append each record as a single line of JSON.
+
+        Returns
+        -------
+        int
+            The number of bytes written.
+        """
+        lines = "".join(json.dumps(r, **settings) + "\n" for r in records)
+        with self.path.open(encoding="utf-8", mode="a") as f:
+            f.write(lines)
+        return len(lines.encode("utf-8"))
 
-    async def _threadsafe_save_json(self, data, settings=PRETTY):
+    async def _threadsafe_append_json_lines(self, records, settings=COMPACT):
         loop = asyncio.get_event_loop()
-        func = functools.partial(self._save_json, data, settings)
+        func = functools.partial(self._append_json_lines, records, settings)
         with await self._lock:
-            await loop.run_in_executor(None, func)
+            return await loop.run_in_executor(None, func)
+
+    def _load_json_lines(self):
+        """Load records written by `_append_json_lines`.
+
+        A truncated last line, e.g. from a crash during a write, is skipped.
+        """
+        log.debug(f"Loading records from {self.path}")
+        records = []
+        with self.path.open(encoding="utf-8", mode="r") as f:
+            for line in f:
+                try:
+                    records.append(json.loads(line))
+                except ValueError:
+                    log.warning(f"Skipping corrupt record in {self.path}")
+                    break
+        return records
+
+    def _truncate(self):
+        with self.path.open(encoding="utf-8", mode="w"):
+            pass
+
+    def _open_snapshot(self):
+        """Open the file for lazy reading.
+
+        Returns
+        -------
+        `SnapshotReader`
+            The reader, or :code:`None` if the file isn't a snapshot.
+
+        """
+        with self.path.open(mode="rb") as f:
+            magic = f.read(len(SnapshotCodec.MAGIC))
+        if not SnapshotCodec.detect(magic):
+            return None
+        log.debug(f"Mapping snapshot {self.path}")
+        return SnapshotReader.open(self.path)
 
     def _load_json(self):
         log.debug(f"Loading file {self.path}")
-        with self.path.open(encoding="utf-8", mode="r") as f:
-            data = json.load(f)
-        return data
+        with self.path.open(mode="rb") as f:
+            raw = f.read()
+        return decode(raw)
 
     async def _threadsafe_load_json(self):
         loop = asyncio.get_event_loop()
         with await self._lock:
-            return await loop.run_in_executor(self._load_json)
+            return await loop.run_in_executor(None, self._load_json)
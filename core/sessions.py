@@ -0,0 +1,75 @@
+import logging
+
+import aiohttp
+
+__all__ = ["SessionRegistry"]
+
+log = logging.getLogger("tbv.sessions")
+
+
+class SessionRegistry:
+    """Long-lived HTTP sessions shared by cogs.
+
+    Each session has its own connection pool, which keeps connections to
+    every host alive between requests. Sessions are created on first use
+    and closed when the bot logs out.
+
+    Example
+    -------
+    ::
+
+        session = bot.sessions.get("webhooks", limit_per_host=10)
+        async with session.get(url) as resp:
+            ...
+
+    """
+
+    def __init__(self):
+        self._sessions = {}
+
+    def get(
+        self,
+        name: str = "default",
+        *,
+        limit: int = 100,
+        limit_per_host: int = 0,
+        keepalive_timeout: float = 60.0,
+        **kwargs
+    ) -> aiohttp.ClientSession:
+        """Get a session, creating it if it doesn't exist or was closed.
+
+        Must be called from a coroutine.
+
+        Parameters
+        ----------
+        name : str
+            Name of the session. Cogs using the same name share a session.
+        limit : int
+            Maximum number of open connections, 0 for no limit.
+        limit_per_host : int
+            Maximum number of open connections to the same host, 0 for no
+            limit.
+        keepalive_timeout : float
+            Seconds an idle connection is kept open.
+        **kwargs
+            Passed to `aiohttp.ClientSession`.
+
+        Only the arguments given when the session is created are used.
+
+        """
+        session = self._sessions.get(name)
+        if session is None or session.closed:
+            connector = aiohttp.TCPConnector(
+                limit=limit, limit_per_host=limit_per_host, keepalive_timeout=keepalive_timeout
+            )
+            session = self._sessions[name] = aiohttp.ClientSession(connector=connector, **kwargs)
+            log.debug(f"Created HTTP session {name}")
+        return session
+
+    async def close(self):
+        """Close all sessions."""
+        sessions = list(self._sessions.values())
+        self._sessions.clear()
+        for session in sessions:
+            if not session.closed:
+                await session.close()
@@ -1,37 +1,21 @@
 __all__ = ["safe_delete", "fuzzy_command_search"]
 
-import logging
-
-from fuzzywuzzy import process
 from discord.ext import commands
 
+from ..checks import VisibilityResolver
 from .chat_formatting import box
 
 
-def fuzzy_filter(record):
-    return record.funcName != "extractWithoutOrder"
-
-
-logging.getLogger().addFilter(fuzzy_filter)
-
-
 async def filter_commands(ctx: commands.Context, extracted: list):
-    return [
-        i
-        for i in extracted
-        if i[1] >= 90
-        and not i[0].hidden
-        and await i[0].can_run(ctx)
-        and all([await p.can_run(ctx) for p in i[0].parents])
-        and not any([p.hidden for p in i[0].parents])
-    ]
+    visible = set(await VisibilityResolver(ctx).filter({i[0] for i in extracted}))
+    return [i for i in extracted if i[0] in visible]
 
 
 async def fuzzy_command_search(ctx: commands.Context, term: str):
     out = ""
-    extracted_cmds = await filter_commands(
-        ctx, process.extract(term, ctx.bot.walk_commands(), limit=5)
-    )
+    # Some of the candidates may be hidden from the invoker.
+    extracted_cmds = await filter_commands(ctx, ctx.bot.command_index.search(term, limit=10))
+    extracted_cmds = extracted_cmds[:5]
 
     if not extracted_cmds:
         return None
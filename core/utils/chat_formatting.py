@@ -1,5 +1,5 @@
 import itertools
-from typing import Sequence, Iterator
+from typing import Iterable, Iterator, Sequence, Union
 
 
 def error(text: str) -> str:
@@ -187,7 +187,7 @@ def bordered(*columns: Sequence[str], ascii_border: bool = False) -> str:
 
 
 def pagify(
-    text: str,
+    text: Union[str, Iterable[str]],
     delims: Sequence[str] = ["\n"],
     *,
     priority: bool = False,
@@ -197,14 +197,19 @@ def pagify(
 ) -> Iterator[str]:
     """Generate multiple pages from the given text.
 
+    The text is walked once, so this takes linear time in its length.
+    Code blocks split across pages are closed at the end of a page and
+    reopened, with the same language, at the start of the next one.
+
     Note
     ----
-    This does not respect code blocks or inline code.
+    This does not respect inline code.
 
     Parameters
     ----------
-    text : str
-        The content to pagify and send.
+    text : `str` or `iterable` of `str`
+        The content to pagify and send, or the lines of it. Lines are
+        consumed as pages are generated, so they can be produced lazily.
     delims : `sequence` of `str`, optional
         Characters where page breaks will occur. If no delimiters are found
         in a page, the page will break after ``page_length`` characters.
@@ -230,33 +235,128 @@ def pagify(
         Pages of the given text.
 
     """
-    in_text = text
-    page_length -= shorten_by
-    while len(in_text) > page_length:
-        this_page_len = page_length
-        if escape_mass_mentions:
-            this_page_len -= in_text.count("@here", 0, page_length) + in_text.count(
-                "@everyone", 0, page_length
-            )
-        closest_delim = (in_text.rfind(d, 1, this_page_len) for d in delims)
-        if priority:
-            closest_delim = next((x for x in closest_delim if x > 0), -1)
-        else:
-            closest_delim = max(closest_delim)
-        closest_delim = closest_delim if closest_delim != -1 else this_page_len
-        if escape_mass_mentions:
-            to_send = escape(in_text[:closest_delim], mass_mentions=True)
-        else:
-            to_send = in_text[:closest_delim]
-        if len(to_send.strip()) > 0:
-            yield to_send
-        in_text = in_text[closest_delim:]
-
-    if len(in_text.strip()) > 0:
-        if escape_mass_mentions:
-            yield escape(in_text, mass_mentions=True)
-        else:
-            yield in_text
+    paginator = _Paginator(delims, priority, escape_mass_mentions, page_length - shorten_by)
+    if isinstance(text, str):
+        yield from paginator.pages(text, final=True)
+        return
+
+    # Lines are joined into chunks of a few pages, and only the text which
+    # didn't fit on a page is carried over to the next chunk.
+    buffer = ""
+    for chunk in _join_lines(text, 4 * page_length):
+        buffer += chunk
+        yield from paginator.pages(buffer, final=False)
+        buffer = buffer[paginator.offset:]
+    yield from paginator.pages(buffer, final=True)
+
+
+def _join_lines(lines: Iterable[str], size: int) -> Iterator[str]:
+    batch = []
+    length = 0
+    sep = ""
+    for line in lines:
+        batch.append(line)
+        length += len(line) + 1
+        if length >= size:
+            yield sep + "\n".join(batch)
+            sep = "\n"
+            batch = []
+            length = 0
+    if batch:
+        yield sep + "\n".join(batch)
+
+
+class _Paginator:
+    """State of `pagify` between chunks of text."""
+
+    FENCE = "```"
+
+    def __init__(self, delims, priority, escape_mass_mentions, page_length):
+        self.delims = delims
+        self.priority = priority
+        self.escape_mass_mentions = escape_mass_mentions
+        self.page_length = page_length
+        # Language of the code block open at the current offset, None if
+        # there is none.
+        self.lang = None
+        self.offset = 0
+
+    def pages(self, text: str, *, final: bool) -> Iterator[str]:
+        """Generate the pages of ``text``. Unless ``final``, text which
+        could still continue on the same page is left over, and `offset`
+        tells where it starts.
+        """
+        start = 0
+        page_length = self.page_length
+        while len(text) - start > page_length - self._reopen_length():
+            end = start + page_length
+            this_page_len = page_length
+            if self.escape_mass_mentions:
+                this_page_len -= text.count("@here", start, end) + text.count(
+                    "@everyone", start, end
+                )
+            # Make room to close and reopen code blocks.
+            this_page_len -= self._reopen_length()
+            if self.lang is not None or text.find(self.FENCE, start, end) != -1:
+                this_page_len -= len(self.FENCE) + 1
+            this_page_len = max(this_page_len, 1)
+
+            closest_delim = (text.rfind(d, start + 1, start + this_page_len) for d in self.delims)
+            if self.priority:
+                closest_delim = next((x for x in closest_delim if x > 0), -1)
+            else:
+                closest_delim = max(closest_delim)
+            cut = closest_delim if closest_delim != -1 else start + this_page_len
+            # Don't break a fence in two.
+            fence = text.rfind(self.FENCE, max(start + 1, cut - 2), cut + 2)
+            if fence != -1 and fence < cut:
+                cut = fence
+
+            page = self._page(text, start, cut)
+            if page is not None:
+                yield page
+            start = cut
+
+        if final:
+            page = self._page(text, start, len(text))
+            if page is not None:
+                yield page
+            start = len(text)
+        self.offset = start
+
+    def _reopen_length(self) -> int:
+        if self.lang is None:
+            return 0
+        return len(self.FENCE) + len(self.lang) + 1
+
+    def _page(self, text: str, start: int, end: int):
+        prefix = ""
+        if self.lang is not None:
+            prefix = self.FENCE + self.lang
+            if text[start:start + 1] != "\n":
+                prefix += "\n"
+
+        fence = text.find(self.FENCE, start, end)
+        while fence != -1:
+            if self.lang is None:
+                line_end = text.find("\n", fence, end)
+                if line_end == -1:
+                    line_end = end
+                lang = text[fence + len(self.FENCE):line_end]
+                self.lang = lang if lang.isalnum() else ""
+            else:
+                self.lang = None
+            fence = text.find(self.FENCE, fence + len(self.FENCE), end)
+
+        page = text[start:end]
+        if not page.strip():
+            return None
+        if self.lang is not None:
+            page += "\n" + self.FENCE
+        page = prefix + page
+        if self.escape_mass_mentions:
+            page = escape(page, mass_mentions=True)
+        return page
 
 
 def strikethrough(text: str) -> str:
@@ -0,0 +1,99 @@
+import heapq
+from collections import defaultdict
+
+__all__ = ["CommandIndex"]
+
+
+def _trigrams(text: str) -> set:
+    text = f"  {text.lower()} "
+    return {text[i:i + 3] for i in range(len(text) - 2)}
+
+
+class CommandIndex:
+    """Trigram index of the names of a bot's commands.
+
+    Every qualified name and alias of a command is split into trigrams,
+    and each trigram maps to the names containing it. Searching only scores
+    names sharing a trigram with the term, instead of every command.
+
+    The index is rebuilt on the first search after `invalidate`, which the
+    bot calls whenever a command is added or removed.
+
+    Parameters
+    ----------
+    bot : `commands.Bot`
+        The bot whose commands are indexed.
+
+    """
+
+    def __init__(self, bot):
+        self.bot = bot
+        self._names = None
+        self._commands = None
+        self._sizes = None
+        # trigram -> indices of the names containing it
+        self._postings = None
+
+    def invalidate(self):
+        self._names = None
+
+    def _build(self):
+        names = []
+        cmds = []
+        for command in set(self.bot.walk_commands()):
+            prefix = command.full_parent_name
+            prefix = prefix + " " if prefix else ""
+            for name in (command.name, *command.aliases):
+                names.append(prefix + name)
+                cmds.append(command)
+        postings = defaultdict(list)
+        sizes = []
+        for i, name in enumerate(names):
+            trigrams = _trigrams(name)
+            sizes.append(len(trigrams))
+            for trigram in trigrams:
+                postings[trigram].append(i)
+        self._commands = cmds
+        self._sizes = sizes
+        self._postings = dict(postings)
+        self._names = names
+
+    def search(self, term: str, limit: int = 5, cutoff: int = 60) -> list:
+        """Find the commands whose names are most similar to ``term``.
+
+        Similarity is the Dice coefficient of the trigrams of both names.
+
+        Parameters
+        ----------
+        term : str
+            The name to look for.
+        limit : int
+            Maximum number of commands to return.
+        cutoff : int
+            Minimum similarity, from 0 to 100.
+
+        Returns
+        -------
+        list
+            ``(command, score)`` tuples, most similar first. A command is
+            listed once, with the score of its best matching name.
+
+        """
+        if self._names is None:
+            self._build()
+        trigrams = _trigrams(term)
+        shared = defaultdict(int)
+        for trigram in trigrams:
+            for i in self._postings.get(trigram, ()):
+                shared[i] += 1
+
+        best = {}
+        for i, count in shared.items():
+            score = 200 * count // (len(trigrams) + self._sizes[i])
+            command = self._commands[i]
+            if score >= cutoff and score > best.get(command, -1):
+                best[command] = score
+        top = heapq.nlargest(
+            limit, best.items(), key=lambda item: (item[1], -len(item[0].qualified_name))
+        )
+        return top
@@ -0,0 +1,102 @@
+from collections.abc import Mapping, Sequence
+
+__all__ = ["FrozenDict", "FrozenList", "freeze", "thaw"]
+
+
+class FrozenDict(Mapping):
+    """Read-only view of a config `dict`.
+
+    Nothing is copied: nested containers are wrapped in views lazily as they
+    are accessed. If ``defaults`` is given, keys missing from ``data`` are
+    looked up in it, which lets a `Group` be viewed with its registered
+    defaults mixed in.
+
+    """
+
+    __slots__ = ("_data", "_defaults")
+
+    def __init__(self, data: dict, defaults: dict = None):
+        self._data = data
+        self._defaults = defaults or {}
+
+    def __getitem__(self, key):
+        try:
+            value = self._data[key]
+        except KeyError:
+            return freeze(self._defaults[key])
+        default = self._defaults.get(key)
+        if isinstance(value, dict) and isinstance(default, dict):
+            return FrozenDict(value, default)
+        return freeze(value)
+
+    def __iter__(self):
+        yield from self._data
+        for key in self._defaults:
+            if key not in self._data:
+                yield key
+
+    def __len__(self):
+        if not self._defaults:
+            return len(self._data)
+        return len(self._data) + sum(1 for k in self._defaults if k not in self._data)
+
+    def __contains__(self, key):
+        return key in self._data or key in self._defaults
+
+    def with_defaults(self, defaults: dict) -> "FrozenDict":
+        """Get a view of the same data with ``defaults`` mixed in."""
+        return FrozenDict(self._data, defaults)
+
+    def __repr__(self):
+        return "FrozenDict({!r})".format(thaw(self))
+
+
+class FrozenList(Sequence):
+    """Read-only view of a config `list`."""
+
+    __slots__ = ("_data",)
+
+    def __init__(self, data: list):
+        self._data = data
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return FrozenList(self._data[index])
+        return freeze(self._data[index])
+
+    def __len__(self):
+        return len(self._data)
+
+    def __contains__(self, value):
+        return value in self._data
+
+    def __eq__(self, other):
+        if isinstance(other, FrozenList):
+            return self._data == other._data
+        if isinstance(other, Sequence) and not isinstance(other, str):
+            return self._data == list(other)
+        return NotImplemented
+
+    def __repr__(self):
+        return "FrozenList({!r})".format(self._data)
+
+
+def freeze(obj):
+    """Get a read-only view of a config value.
+
+    Scalars are returned as they are, since they are already immutable.
+    """
+    if isinstance(obj, dict):
+        return FrozenDict(obj)
+    if isinstance(obj, list):
+        return FrozenList(obj)
+    return obj
+
+
+def thaw(obj):
+    """Get a mutable deep copy of a value returned by `freeze`."""
+    if isinstance(obj, Mapping):
+        return {k: thaw(v) for k, v in obj.items()}
+    if isinstance(obj, (FrozenList, list)):
+        return [thaw(v) for v in obj]
+    return obj
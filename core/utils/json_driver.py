@@ -1,21 +1,187 @@
+import asyncio
 import copy
+import itertools
 import logging
+import os
+import weakref
+from collections import Counter, OrderedDict
+from urllib.parse import quote, unquote
 
 from core.json_io import JsonIO
+from core.utils.frozen import freeze
+from core.utils.subscriptions import subscriptions_for
 from pathlib import Path
 
-__all__ = ["JSON"]
+__all__ = ["JSON", "ShardedJSON", "flush_all"]
 
 log = logging.getLogger("tbv.data_io")
 
 _shared_datastore = {}
+_shared_owned = {}
+_drivers = weakref.WeakSet()
+_MISSING = object()
+
+# Number of scope keys decoded from a snapshot between yields to the loop.
+_MATERIALISE_CHUNK = 256
+
+
+class _LazyLoad:
+    """Scope keys of a datastore which are still only in its snapshot file,
+    shared like the data.
+    """
+
+    def __init__(self, reader):
+        self.reader = reader
+        # scope -> keys, :code:`None` standing for the whole scope.
+        self.remaining = {scope: set(keys) for scope, keys in reader.index.items()}
+        self.task = None
+
+    def partitions(self, identifiers=()):
+        """Iterate over the remaining partitions which hold data at
+        ``identifiers``.
+        """
+        if not identifiers:
+            return ((s, k) for s, keys in self.remaining.items() for k in keys)
+        scope = identifiers[0]
+        keys = self.remaining.get(scope, ())
+        if len(identifiers) > 1 and None not in keys:
+            keys = {identifiers[1]} & keys
+        return ((scope, k) for k in keys)
+
+
+_shared_lazy = {}
+_shared_loading = {}
+
+
+try:
+    _current_task = asyncio.current_task
+except AttributeError:  # Python 3.6
+    _current_task = asyncio.Task.current_task
+
+
+class _TransactionState:
+    """The open transaction of a datastore, shared like the data.
+
+    Only one task at a time may have a transaction open. Other tasks wait
+    for it to exit before opening their own or mutating the datastore.
+    """
+
+    def __init__(self):
+        self.lock = asyncio.Lock()
+        self.owner = None
+        self.depth = 0
+        self.undo = []
+        self.records = []
+
+
+_shared_transactions = {}
+
+
+class _Transaction:
+    """Async context manager returned by `JSON.transaction`."""
+
+    def __init__(self, driver):
+        self.driver = driver
+        self._undo_mark = 0
+        self._record_mark = 0
+
+    async def __aenter__(self):
+        txn = self.driver._txn
+        task = _current_task()
+        if txn.owner is not task:
+            await txn.lock.acquire()
+            txn.owner = task
+        self._undo_mark = len(txn.undo)
+        self._record_mark = len(txn.records)
+        txn.depth += 1
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb):
+        driver = self.driver
+        txn = driver._txn
+        txn.depth -= 1
+        if exc_type is not None:
+            restored = []
+            while len(txn.undo) > self._undo_mark:
+                identifiers, value = txn.undo.pop()
+                driver._restore_path(identifiers, value)
+                restored.append((identifiers, None if value is _MISSING else value))
+            del txn.records[self._record_mark:]
+            # Readers may have seen the changes which were undone.
+            for identifiers, value in restored:
+                driver._subscriptions.notify(identifiers, value)
+        if txn.depth:
+            return False
+        records = txn.records
+        txn.records = []
+        txn.undo = []
+        try:
+            if records:
+                await driver._commit(*records)
+        finally:
+            txn.owner = None
+            txn.lock.release()
+        return False
+
+
+class _Pinned:
+    """Async context manager returned by `JSON._pinned`."""
+
+    def __init__(self, driver, identifiers):
+        self.driver = driver
+        self.identifiers = identifiers
+        self._pins = ()
+
+    async def __aenter__(self):
+        self._pins = await self.driver._pin(self.identifiers)
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb):
+        self.driver._unpin(self._pins)
+        return False
+
 
 class JSON():
+    """JSON file driver for `Config`.
+
+    Parameters
+    ----------
+    cog_name : str
+        Name of the cog the data belongs to.
+    data_path : `pathlib.Path`, optional
+        Folder to keep the data file in.
+    file_name : str
+        Name of the data file.
+    flush_interval : `float`, optional
+        Enables write-behind mode. Mutations only mark the datastore as
+        dirty and it is written to disk at most once per ``flush_interval``
+        seconds, on `flush` and on shutdown. If :code:`None`, every
+        mutation is written to disk immediately.
+    journal : bool
+        Enables journalled mode. Instead of rewriting the whole data file,
+        every mutation appends a compact record to ``<file_name>.log``. The
+        log is replayed on top of the data file on load and folded into it
+        once it grows beyond ``journal_max_size`` bytes.
+    journal_max_size : int
+        Size of the log in bytes which triggers a compaction.
+    codec : optional
+        The codec to save the data file with, see `core.json_io.get_codec`.
+        Pretty printed JSON by default. Files are loaded whatever codec they
+        were saved with. Files saved with the snapshot codec are memory
+        mapped instead of loaded: a scope key, e.g. a guild, is decoded the
+        first time it is accessed, while the rest are decoded in the
+        background.
+
+    """
     def __init__(
             self,
             cog_name,
             data_path: Path = None,
-            file_name: str = "settings.json"):
+            file_name: str = "settings.json",
+            flush_interval: float = None,
+            journal: bool = False,
+            journal_max_size: int = 2**20,
+            codec=None):
         self.cog_name = cog_name
         self.file_name = file_name
         if data_path:
@@ -23,10 +189,22 @@ class JSON():
         else:
             self.data_path = Path.cwd() / "data" / "cogs" / self.cog_name
 
-        self.data_path.mkdir(parents=True, exist_ok=True)
         self.data_path = self.data_path / self.file_name
-        self.jsonIO = JsonIO(self.data_path)
-        self._load_data()
+        self.codec = codec
+        self.jsonIO = JsonIO(self.data_path, codec=codec)
+        self.flush_interval = flush_interval
+        self._dirty = False
+        self._flush_task = None
+        self.journal = journal
+        self.journal_max_size = journal_max_size
+        self._pending = []
+        self._journal_size = 0
+        self._journal_lock = asyncio.Lock()
+        self._compact_task = None
+        self._subscriptions = subscriptions_for(cog_name)
+        if journal:
+            self.journalIO = JsonIO(self.data_path.with_name(self.file_name + ".log"))
+        _drivers.add(self)
 
     @property
     def data(self):
@@ -36,39 +214,692 @@ class JSON():
     def data(self, value):
         _shared_datastore[self.cog_name] = value
 
+    @property
+    def _txn(self) -> _TransactionState:
+        txn = _shared_transactions.get(self.cog_name)
+        if txn is None:
+            txn = _shared_transactions[self.cog_name] = _TransactionState()
+        return txn
+
+    @property
+    def _owned(self) -> dict:
+        """Dicts of the datastore created since the last snapshot.
+
+        The datastore is copy-on-write: every other dict may be referenced by
+        a snapshot which is being saved, so it is copied before it is
+        modified. Maps ``id(node) -> node``; holding the nodes keeps their ids
+        from being reused.
+        """
+        return _shared_owned.setdefault(self.cog_name, {})
+
+    def _snapshot(self) -> dict:
+        """Get the datastore in a state which will never change.
+
+        This costs nothing: from now on, mutations copy the dicts they touch
+        instead of modifying them.
+        """
+        self._owned.clear()
+        return self.data
+
+    def _own(self, node: dict) -> dict:
+        owned = self._owned
+        if id(node) not in owned:
+            node = dict(node)
+            owned[id(node)] = node
+        return node
+
     def _load_data(self):
         if self.data is not None:
             return
-        
+
+        self.data_path.parent.mkdir(parents=True, exist_ok=True)
         try:
-            self.data = self.jsonIO._load_json()
+            reader = self.jsonIO._open_snapshot()
+            if reader is None:
+                self.data = self.jsonIO._load_json()
+            else:
+                self.data = {}
+                _shared_lazy[self.cog_name] = _LazyLoad(reader)
         except FileNotFoundError:
             self.data = {}
             self.jsonIO._save_json(self.data)
 
-    async def get(self, *identifiers):
-        partial = self.data
-        for i in identifiers:
-            partial = partial[i]
-        return copy.deepcopy(partial)
+        if self.journal:
+            self._replay_journal()
 
-    async def set(self, *identifiers, value):
-        partial = self.data
+    async def _ensure_data(self):
+        """Load the datastore if it hasn't been loaded yet.
+
+        The data is loaded in a thread on first access rather than when the
+        driver is created. Concurrent first accesses, including those through
+        other drivers of the same cog, wait for the same load.
+        """
+        loading = _shared_loading.get(self.cog_name)
+        if loading is None:
+            loading = _shared_loading[self.cog_name] = asyncio.ensure_future(self._load())
+        elif loading.done():
+            return
+        await asyncio.shield(loading)
+
+    async def _load(self):
+        loop = asyncio.get_event_loop()
+        try:
+            await loop.run_in_executor(None, self._load_data)
+        except Exception:
+            # Let the next access try again.
+            del _shared_loading[self.cog_name]
+            raise
+
+    def _materialise(self, partitions):
+        """Decode partitions of the snapshot into the datastore.
+
+        Partitions which were decoded already are skipped. The snapshot is
+        closed once everything has been decoded.
+        """
+        lazy = _shared_lazy.get(self.cog_name)
+        if lazy is None:
+            return
+        for scope, key in partitions:
+            keys = lazy.remaining.get(scope)
+            if keys is None or key not in keys:
+                continue
+            data = lazy.reader.read(scope, key)
+            keys.discard(key)
+            if not keys:
+                del lazy.remaining[scope]
+            self._set_path((scope,) if key is None else (scope, key), data)
+        if not lazy.remaining:
+            del _shared_lazy[self.cog_name]
+            lazy.reader.close()
+            log.debug(f"Materialised the snapshot of {self.cog_name}")
+
+    async def _materialise_all(self):
+        try:
+            while self.cog_name in _shared_lazy:
+                lazy = _shared_lazy[self.cog_name]
+                self._materialise(list(itertools.islice(lazy.partitions(), _MATERIALISE_CHUNK)))
+                await asyncio.sleep(0)
+        except Exception:
+            log.exception(f"Failed to load the snapshot of {self.cog_name}")
+
+    def _replay_journal(self):
+        try:
+            records = self.journalIO._load_json_lines()
+        except FileNotFoundError:
+            return
+        lazy = _shared_lazy.get(self.cog_name)
+        for record in records:
+            if lazy is not None:
+                self._materialise(list(lazy.partitions(record[1])))
+            if record[0] == "s":
+                self._set_path(record[1], record[2])
+            else:
+                self._clear_path(record[1])
+        self._journal_size = self.journalIO.path.stat().st_size
+        log.debug(f"Replayed {len(records)} records for {self.cog_name}")
+
+    def _set_path(self, identifiers, value):
+        if not identifiers:
+            self.data = value
+            return
+        partial = self.data = self._own(self.data)
         for i in identifiers[:-1]:
             if i not in partial:
-                partial[i] = {}
-            partial = partial[i]
+                child = {}
+                self._owned[id(child)] = child
+            else:
+                child = self._own(partial[i])
+            partial[i] = child
+            partial = child
 
-        partial[identifiers[-1]] = copy.deepcopy(value)
-        await self.jsonIO._threadsafe_save_json(self.data)
+        partial[identifiers[-1]] = value
 
-    async def clear(self, *identifiers):
+    def _clear_path(self, identifiers) -> bool:
+        if not identifiers:
+            self.data = {}
+            return True
         partial = self.data
         try:
             for i in identifiers[:-1]:
                 partial = partial[i]
-            del partial[identifiers[-1]]
+            partial[identifiers[-1]]
         except KeyError:
-            pass
+            return False
+
+        partial = self.data = self._own(self.data)
+        for i in identifiers[:-1]:
+            partial[i] = partial = self._own(partial[i])
+        del partial[identifiers[-1]]
+        return True
+
+    def _restore_path(self, identifiers, value):
+        if value is _MISSING:
+            self._clear_path(identifiers)
         else:
-            await self.jsonIO._threadsafe_save_json(self.data)
+            self._set_path(identifiers, value)
+
+    def _record_undo(self, identifiers):
+        """Remember what a mutation at ``identifiers`` is about to replace."""
+        undo = self._txn.undo
+        partial = self.data
+        for n, i in enumerate(identifiers, 1):
+            if not isinstance(partial, dict) or i not in partial:
+                undo.append((identifiers[:n], _MISSING))
+                return
+            partial = partial[i]
+        undo.append((identifiers, partial))
+
+    def transaction(self):
+        """Group several mutations into one write.
+
+        Mutations made inside the ``async with`` block are applied to the
+        datastore immediately, but persisted together once the outermost
+        block exits. If the block raises, its mutations are undone and nothing
+        is written.
+
+        Only one task at a time may have a transaction open on a datastore.
+        Transactions and mutations of other tasks wait until the block exits,
+        so it must not wait for them itself.
+
+        """
+        return _Transaction(self)
+
+    async def _wait_for_transaction(self):
+        """Wait until no other task has a transaction open.
+
+        Returns without yielding to the loop once that is the case, so the
+        caller may mutate the datastore right away.
+        """
+        txn = self._txn
+        while txn.owner is not None and txn.owner is not _current_task():
+            with await txn.lock:
+                pass
+
+    async def _ensure_loaded(self, identifiers):
+        """Make sure the data at ``identifiers`` is in memory."""
+        await self._ensure_data()
+        lazy = _shared_lazy.get(self.cog_name)
+        if lazy is None:
+            return
+        if lazy.task is None:
+            lazy.task = asyncio.ensure_future(self._materialise_all())
+        partitions = list(lazy.partitions(identifiers))
+        for i in range(0, len(partitions), _MATERIALISE_CHUNK):
+            if i:
+                await asyncio.sleep(0)
+            self._materialise(partitions[i:i + _MATERIALISE_CHUNK])
+
+    def _pinned(self, identifiers) -> _Pinned:
+        """Get an async context manager which loads the data at
+        ``identifiers`` and keeps it in memory until it exits.
+        """
+        return _Pinned(self, identifiers)
+
+    async def _pin(self, identifiers):
+        await self._ensure_loaded(identifiers)
+        return ()
+
+    def _unpin(self, pins):
+        pass
+
+    async def get(self, *identifiers, frozen: bool = False):
+        """Get the data at the given path.
+
+        By default a deep copy is returned. With ``frozen`` set, a read-only
+        view of the stored data is returned instead, which costs no copying.
+        """
+        async with self._pinned(identifiers):
+            partial = self.data
+            for i in identifiers:
+                partial = partial[i]
+            if frozen:
+                return freeze(partial)
+            return copy.deepcopy(partial)
+
+    async def keys(self, *identifiers) -> list:
+        """Get the keys of the dict at the given path without copying it."""
+        async with self._pinned(identifiers):
+            partial = self.data
+            for i in identifiers:
+                partial = partial[i]
+            return list(partial)
+
+    async def set(self, *identifiers, value):
+        value = copy.deepcopy(value)
+        async with self._pinned(identifiers):
+            await self._wait_for_transaction()
+            if self._txn.depth:
+                self._record_undo(identifiers)
+            self._set_path(identifiers, value)
+            await self._commit(("s", identifiers, value))
+
+    async def clear(self, *identifiers):
+        async with self._pinned(identifiers):
+            await self._wait_for_transaction()
+            if self._txn.depth:
+                self._record_undo(identifiers)
+            if self._clear_path(identifiers):
+                await self._commit(("c", identifiers))
+            elif self._txn.depth:
+                self._txn.undo.pop()
+
+    async def export_json(self, path: Path):
+        """Save all data as pretty printed JSON to ``path``, e.g. to inspect
+        data saved with the binary codec.
+        """
+        async with self._pinned(()):
+            snapshot = self._snapshot()
+        loop = asyncio.get_event_loop()
+        await loop.run_in_executor(None, self.jsonIO._export_json, path, snapshot)
+
+    async def flush(self):
+        """Write pending changes to disk."""
+        if not self._dirty:
+            return
+        self._dirty = False
+        try:
+            await self._write()
+        except Exception:
+            self._dirty = True
+            raise
+
+    def subscribe(self, identifiers, callback):
+        """Call ``callback`` after the data at ``identifiers`` changes.
+
+        See `core.utils.subscriptions.Subscriptions.subscribe`.
+        """
+        return self._subscriptions.subscribe(identifiers, callback)
+
+    async def _commit(self, *records):
+        if self._txn.depth:
+            self._txn.records.extend(records)
+            return
+        try:
+            if self.journal:
+                self._pending.extend(records)
+            if self.flush_interval is None:
+                await self._write()
+                return
+            self._dirty = True
+            if self._flush_task is None or self._flush_task.done():
+                self._flush_task = asyncio.ensure_future(self._delayed_flush())
+        finally:
+            # The change is in the datastore even if writing it failed.
+            for record in records:
+                self._subscriptions.notify(record[1], record[2] if record[0] == "s" else None)
+
+    async def _write(self):
+        if not self.journal:
+            await self._ensure_loaded(())
+            await self.jsonIO._threadsafe_save_json(self._snapshot())
+            return
+        records, self._pending = self._pending, []
+        if not records:
+            return
+        try:
+            with await self._journal_lock:
+                self._journal_size += await self.journalIO._threadsafe_append_json_lines(records)
+        except Exception:
+            self._pending[:0] = records
+            raise
+        if self._journal_size > self.journal_max_size and (
+            self._compact_task is None or self._compact_task.done()
+        ):
+            self._compact_task = asyncio.ensure_future(self._compact())
+
+    async def _compact(self):
+        """Fold the log into a fresh data file."""
+        loop = asyncio.get_event_loop()
+        try:
+            with await self._journal_lock:
+                await self._ensure_loaded(())
+                await self.jsonIO._threadsafe_save_json(self._snapshot())
+                await loop.run_in_executor(None, self.journalIO._truncate)
+                self._journal_size = 0
+        except Exception:
+            log.exception(f"Failed to compact the journal of {self.cog_name}")
+        else:
+            log.debug(f"Compacted the journal of {self.cog_name}")
+
+    async def _delayed_flush(self):
+        await asyncio.sleep(self.flush_interval)
+        try:
+            await self.flush()
+        except Exception:
+            log.exception(f"Failed to flush data of {self.cog_name}")
+
+
+class _Shards:
+    """Bookkeeping of a `ShardedJSON` datastore, shared like the data."""
+
+    def __init__(self):
+        self.on_disk = set()
+        # Resident partitions in LRU order, mapped to their size in bytes.
+        self.loaded = OrderedDict()
+        self.resident_bytes = 0
+        self.loading = {}
+        self.dirty = set()
+        # Partitions in use, which may not be evicted, mapped to the number
+        # of users.
+        self.pinned = Counter()
+        self.evictions = 0
+        self.io = {}
+
+    def set_size(self, partition, size):
+        self.resident_bytes += size - self.loaded.get(partition, 0)
+        self.loaded[partition] = size
+
+    def drop(self, partition):
+        self.resident_bytes -= self.loaded.pop(partition, 0)
+
+
+_shared_shards = {}
+
+
+class ShardedJSON(JSON):
+    """JSON driver which keeps every scope key in its own file.
+
+    ``GLOBAL`` data is kept in ``GLOBAL.json`` and everything else in
+    ``<SCOPE>/<key>.json``, e.g. ``GUILD/<guild_id>.json`` or
+    ``MEMBER/<guild_id>.json``. Files are loaded the first time their data is
+    accessed and only the files whose data changed are rewritten.
+
+    An existing ``settings.json`` is split into shards on first load.
+
+    Takes the same parameters as `JSON`, except for journalling, and:
+
+    Parameters
+    ----------
+    memory_budget : `int`, optional
+        Approximate number of bytes of shard data to keep in memory. When it
+        is exceeded, the least recently used shards are written out if they
+        have changes and dropped from memory until they are accessed again.
+        ``GLOBAL`` data is never dropped. If :code:`None`, every loaded shard
+        stays in memory.
+
+    """
+
+    def __init__(self, cog_name, data_path: Path = None, memory_budget: int = None, **kwargs):
+        kwargs.pop("journal", None)
+        kwargs.pop("journal_max_size", None)
+        self.memory_budget = memory_budget
+        super().__init__(cog_name, data_path=data_path, **kwargs)
+
+    @property
+    def shards(self) -> _Shards:
+        return _shared_shards[self.cog_name]
+
+    def stats(self) -> dict:
+        """Get statistics about the shards of this datastore.
+
+        Sizes are those of the shard files when they were last loaded or
+        written, so they lag behind unsaved changes.
+
+        Returns
+        -------
+        dict
+            Number of resident, dirty and stored shards, the bytes of
+            resident shards, and the number of evictions so far.
+
+        """
+        shards = self.shards
+        return {
+            "resident_partitions": len(shards.loaded),
+            "resident_bytes": shards.resident_bytes,
+            "dirty_partitions": len(shards.dirty),
+            "stored_partitions": len(shards.on_disk),
+            "evictions": shards.evictions,
+        }
+
+    def _shard_file(self, partition) -> Path:
+        if len(partition) == 1:
+            return self.data_path.with_name(partition[0] + ".json")
+        return self.data_path.parent / partition[0] / (quote(partition[1], safe="") + ".json")
+
+    def _load_data(self):
+        if self.data is not None:
+            return
+
+        self.data_path.parent.mkdir(parents=True, exist_ok=True)
+        self.data = {}
+        shards = _shared_shards[self.cog_name] = _Shards()
+        root = self.data_path.parent
+        for entry in os.scandir(str(root)):
+            if entry.is_file() and entry.name == "GLOBAL.json":
+                shards.on_disk.add(("GLOBAL",))
+            elif entry.is_dir():
+                for shard in os.scandir(entry.path):
+                    if shard.name.endswith(".json"):
+                        key = unquote(shard.name[:-len(".json")])
+                        shards.on_disk.add((entry.name, key))
+
+        if not shards.on_disk and self.data_path.exists():
+            log.info(f"Splitting {self.data_path} into shards")
+            self.data = self.jsonIO._load_json()
+            for scope, scope_data in self.data.items():
+                if scope == "GLOBAL":
+                    partitions = [(scope,)]
+                else:
+                    partitions = [(scope, key) for key in scope_data]
+                for partition in partitions:
+                    shards.set_size(partition, self._save_shard(partition, self.data))
+                    shards.on_disk.add(partition)
+
+    def _partitions(self, identifiers):
+        """Get the partitions which hold the data at ``identifiers``."""
+        shards = self.shards
+        if not identifiers:
+            return shards.on_disk.union(shards.loaded)
+        scope = identifiers[0]
+        if scope == "GLOBAL":
+            return {(scope,)}
+        if len(identifiers) == 1:
+            return {p for p in shards.on_disk.union(shards.loaded) if p[0] == scope}
+        return {(scope, identifiers[1])}
+
+    async def _ensure_loaded(self, identifiers):
+        await self._ensure_data()
+        shards = self.shards
+        partitions = self._partitions(identifiers)
+        to_load = [p for p in partitions if p not in shards.loaded and p in shards.on_disk]
+        if to_load:
+            await asyncio.gather(*(self._load_shard(p) for p in to_load))
+        for partition in partitions:
+            if partition in shards.loaded:
+                shards.loaded.move_to_end(partition)
+        if to_load:
+            await self._evict(protect=partitions)
+
+    async def _pin(self, identifiers):
+        await self._ensure_data()
+        partitions = self._partitions(identifiers)
+        self.shards.pinned.update(partitions)
+        try:
+            await self._ensure_loaded(identifiers)
+        except BaseException:
+            self._unpin(partitions)
+            raise
+        return partitions
+
+    def _unpin(self, pins):
+        pinned = self.shards.pinned
+        pinned.subtract(pins)
+        for partition in pins:
+            if pinned[partition] <= 0:
+                del pinned[partition]
+
+    async def keys(self, *identifiers) -> list:
+        if len(identifiers) == 1 and identifiers[0] != "GLOBAL":
+            await self._ensure_data()
+            # Listing a scope does not require loading its shards.
+            keys = [p[1] for p in self._partitions(identifiers) if self._has_data(p)]
+            if not keys and identifiers[0] not in self.data:
+                raise KeyError(identifiers[0])
+            return keys
+        return await super().keys(*identifiers)
+
+    def _has_data(self, partition) -> bool:
+        """Whether a partition holds data, in memory or on disk."""
+        if partition not in self.shards.loaded:
+            return partition in self.shards.on_disk
+        partial = self.data
+        try:
+            for i in partition:
+                partial = partial[i]
+        except (KeyError, TypeError):
+            return False
+        return True
+
+    def _shard_io(self, partition) -> JsonIO:
+        shards = self.shards
+        if partition not in shards.io:
+            shards.io[partition] = JsonIO(self._shard_file(partition), codec=self.codec)
+        return shards.io[partition]
+
+    def _read_shard(self, partition):
+        io = self._shard_io(partition)
+        return io._load_json(), io.path.stat().st_size
+
+    async def _load_shard(self, partition):
+        shards = self.shards
+        if partition in shards.loading:
+            return await shards.loading[partition]
+        loop = asyncio.get_event_loop()
+        future = shards.loading[partition] = loop.create_future()
+        try:
+            data, size = await loop.run_in_executor(None, self._read_shard, partition)
+            self._set_path(partition, data)
+            shards.set_size(partition, size)
+            future.set_result(None)
+        except Exception as e:
+            future.set_exception(e)
+            raise
+        finally:
+            del shards.loading[partition]
+
+    def _save_shard(self, partition, root: dict):
+        """Write a partition of ``root`` to its file, or remove the file if
+        the partition holds no data.
+
+        Returns
+        -------
+        int
+            The size of the written file.
+
+        """
+        path = self._shard_file(partition)
+        try:
+            partial = root
+            for i in partition:
+                partial = partial[i]
+        except KeyError:
+            if path.exists():
+                path.unlink()
+            return 0
+        path.parent.mkdir(exist_ok=True)
+        self._shard_io(partition)._save_json(partial)
+        return path.stat().st_size
+
+    async def _commit(self, *records):
+        if not self._txn.depth:
+            shards = self.shards
+            for record in records:
+                action, identifiers = record[0], record[1]
+                partitions = self._partitions(identifiers)
+                if action == "s":
+                    value = record[2]
+                    if len(identifiers) == 1 and identifiers[0] != "GLOBAL":
+                        # Setting a whole scope may create partitions.
+                        if isinstance(value, dict):
+                            partitions |= {(identifiers[0], key) for key in value}
+                for partition in partitions:
+                    if partition in shards.loaded:
+                        continue
+                    if partition in shards.on_disk and len(identifiers) > len(partition):
+                        # Only the change is in memory, not the rest of the
+                        # partition. Load it and make the change again.
+                        await self._load_shard(partition)
+                        if action == "s":
+                            self._set_path(identifiers, value)
+                        else:
+                            self._clear_path(identifiers)
+                    elif action == "s":
+                        # The partition is replaced as a whole, or did not
+                        # exist yet, so its in-memory data is authoritative.
+                        shards.set_size(partition, 0)
+                shards.dirty.update(partitions)
+        await super()._commit(*records)
+
+    async def _write(self):
+        await self._write_shards(set(self.shards.dirty))
+        await self._evict()
+
+    async def _write_shards(self, partitions):
+        shards = self.shards
+        shards.dirty -= partitions
+        loop = asyncio.get_event_loop()
+        remaining = set(partitions)
+        snapshot = self._snapshot()
+        try:
+            for partition in partitions:
+                io = self._shard_io(partition)
+                with await io._lock:
+                    size = await loop.run_in_executor(
+                        None, self._save_shard, partition, snapshot
+                    )
+                remaining.discard(partition)
+                if size:
+                    shards.on_disk.add(partition)
+                    if partition in shards.loaded:
+                        shards.set_size(partition, size)
+                else:
+                    shards.on_disk.discard(partition)
+                    # Unless it was set again meanwhile, the partition no
+                    # longer exists.
+                    if partition not in shards.dirty:
+                        shards.drop(partition)
+        except Exception:
+            shards.dirty |= remaining
+            raise
+
+    async def _evict(self, protect=()):
+        """Drop least recently used shards until the memory budget is met."""
+        shards = self.shards
+        budget = self.memory_budget
+        if budget is None or self._txn.depth or shards.resident_bytes <= budget:
+            return
+
+        def candidates():
+            excess = shards.resident_bytes - budget
+            for partition, size in shards.loaded.items():
+                if excess <= 0:
+                    return
+                if partition[0] == "GLOBAL" or partition in protect or partition in shards.pinned:
+                    continue
+                excess -= size
+                yield partition
+
+        to_write = {p for p in candidates() if p in shards.dirty}
+        if to_write:
+            await self._write_shards(to_write)
+
+        # Anything which changed while writing is dirty again and stays.
+        for partition in list(candidates()):
+            if partition in shards.dirty or partition in shards.loading:
+                continue
+            self._clear_path(partition)
+            shards.drop(partition)
+            shards.evictions += 1
+        log.debug(f"Shards of {self.cog_name} after eviction: {self.stats()}")
+
+
+async def flush_all():
+    """Flush every write-behind driver.
+
+    This should be awaited before shutting down.
+    """
+    for driver in list(_drivers):
+        try:
+            await driver.flush()
+        except Exception:
+            log.exception(f"Failed to flush data of {driver.cog_name}")
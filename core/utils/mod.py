@@ -6,6 +6,7 @@ import discord
 
 from core.config import Config
 from core.bot import TheBotVanished
+from core.caches import PermissionLevel
 
 
 async def mass_purge(messages: List[discord.Message], channel: discord.TextChannel):
@@ -110,6 +111,18 @@ def strfdelta(delta: timedelta):
     return " ".join(s)
 
 
+async def _level(bot: TheBotVanished, obj) -> PermissionLevel:
+    if isinstance(obj, discord.Message):
+        return await bot.permission_cache.level(obj.author)
+    elif isinstance(obj, discord.Member):
+        return await bot.permission_cache.level(obj)
+    elif isinstance(obj, discord.Role):
+        settings = await bot.settings_cache.get(obj.guild)
+        return settings.role_level({obj.id})
+    else:
+        raise TypeError("Only messages, members or roles may be passed")
+
+
 async def is_mod_or_superior(
         bot: TheBotVanished,
         obj: Union[discord.Message, discord.Member, discord.Role]):
@@ -136,35 +149,7 @@ async def is_mod_or_superior(
         If the wrong type of ``obj`` was passed.
 
     """
-    user = None
-    if isinstance(obj, discord.Message):
-        user = obj.author
-    elif isinstance(obj, discord.Member):
-        user = obj
-    elif isinstance(obj, discord.Role):
-        pass
-    else:
-        raise TypeError("Only messages, members or roles may be passed")
-
-    server = obj.guild
-    admin_role_id = await bot.conf.guild(server).admin_role()
-    mod_role_id = await bot.conf.guild(server).mod_role()
-
-    if isinstance(obj, discord.Role):
-        return obj.id in [admin_role_id, mod_role_id]
-    mod_roles = [r for r in server.roles if r.id == mod_role_id]
-    mod_role = mod_roles[0] if len(mod_roles) > 0 else None
-    admin_roles = [r for r in server.roles if r.id == admin_role_id]
-    admin_role = admin_roles[0] if len(admin_roles) > 0 else None
-
-    if user and user == await bot.is_owner(user):
-        return True
-    elif admin_role and discord.utils.get(user.roles, name=admin_role):
-        return True
-    elif mod_role and discord.utils.get(user.roles, name=mod_role):
-        return True
-    else:
-        return False
+    return await _level(bot, obj) >= PermissionLevel.MOD
 
 
 async def is_admin_or_superior(
@@ -194,28 +179,5 @@ async def is_admin_or_superior(
         If the wrong type of ``obj`` was passed.
 
     """
-    user = None
-    if isinstance(obj, discord.Message):
-        user = obj.author
-    elif isinstance(obj, discord.Member):
-        user = obj
-    elif isinstance(obj, discord.Role):
-        pass
-    else:
-        raise TypeError("Only messages, members or roles may be passed")
-
-    server = obj.guild
-    admin_role_id = await bot.conf.guild(server).admin_role()
-
-    if isinstance(obj, discord.Role):
-        return obj.id == admin_role_id
-    admin_roles = [r for r in server.roles if r.id == admin_role_id]
-    admin_role = admin_roles[0] if len(admin_roles) > 0 else None
-
-    if user and await bot.is_owner(user):
-        return True
-    elif admin_roles and discord.utils.get(user.roles, name=admin_role):
-        return True
-    else:
-        return False
+    return await _level(bot, obj) >= PermissionLevel.ADMIN
 
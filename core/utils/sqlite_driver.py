@@ -0,0 +1,379 @@
+import asyncio
+import concurrent.futures
+import functools
+import itertools
+import json
+import logging
+import sqlite3
+
+from core.utils.frozen import freeze
+from core.utils.subscriptions import subscriptions_for
+from pathlib import Path
+
+__all__ = ["SQLite"]
+
+log = logging.getLogger("tbv.data_io")
+
+COMPACT = {"separators": (",", ":")}
+
+
+try:
+    _current_task = asyncio.current_task
+except AttributeError:  # Python 3.6
+    _current_task = asyncio.Task.current_task
+
+_savepoint_ids = itertools.count()
+
+
+class _Transaction:
+    """Async context manager returned by `SQLite.transaction`."""
+
+    def __init__(self, driver):
+        self.driver = driver
+        self._name = None
+        self._change_mark = 0
+
+    async def __aenter__(self):
+        driver = self.driver
+        task = _current_task()
+        if driver._txn_owner is not task:
+            await driver._txn_lock.acquire()
+            driver._txn_owner = task
+        self._change_mark = len(driver._txn_changes)
+        self._name = f"txn_{next(_savepoint_ids)}"
+        try:
+            await driver._run(driver._execute, f"SAVEPOINT {self._name}")
+        except BaseException:
+            self._exit()
+            raise
+        driver._txn_depth += 1
+        return self
+
+    def _exit(self):
+        driver = self.driver
+        if driver._txn_depth == 0:
+            driver._txn_owner = None
+            driver._txn_lock.release()
+
+    async def __aexit__(self, exc_type, exc, tb):
+        driver = self.driver
+        driver._txn_depth -= 1
+        try:
+            if exc_type is not None:
+                await driver._run(driver._rollback_to, self._name)
+                undone = driver._txn_changes[self._change_mark:]
+                del driver._txn_changes[self._change_mark:]
+                # Readers may have seen the changes which were undone.
+                for identifiers, _ in undone:
+                    driver._subscriptions.notify(
+                        identifiers, await driver._run(driver._get_or_none, identifiers)
+                    )
+                return False
+            await driver._run(driver._execute, f"RELEASE {self._name}")
+        finally:
+            self._exit()
+        if driver._txn_depth == 0:
+            changes, driver._txn_changes = driver._txn_changes, []
+            for identifiers, value in changes:
+                driver._subscriptions.notify(identifiers, value)
+        return False
+
+
+class SQLite():
+    """SQLite driver for `Config`.
+
+    Every scope (``GLOBAL``, ``GUILD``, ``MEMBER`` ...) is kept in its own
+    table. A row holds the data of a single scope key, e.g. one guild, or one
+    member of a guild in the ``MEMBER`` scope, so reading or writing a value
+    only touches one row through the primary key index.
+
+    All database access happens on a single worker thread, so it never
+    blocks the event loop.
+
+    Parameters
+    ----------
+    cog_name : str
+        Name of the cog the data belongs to.
+    data_path : `pathlib.Path`, optional
+        Folder to keep the database in.
+    file_name : str
+        Name of the database file.
+
+    """
+
+    #: Number of identifiers after the scope which make up the key of a row.
+    key_lengths = {"MEMBER": 2}
+
+    def __init__(
+            self,
+            cog_name,
+            data_path: Path = None,
+            file_name: str = "settings.db"):
+        self.cog_name = cog_name
+        self.file_name = file_name
+        if data_path:
+            self.data_path = data_path
+        else:
+            self.data_path = Path.cwd() / "data" / "cogs" / self.cog_name
+
+        self.data_path.mkdir(parents=True, exist_ok=True)
+        self.data_path = self.data_path / self.file_name
+        self._executor = concurrent.futures.ThreadPoolExecutor(max_workers=1)
+        self._conn = None
+        self._tables = set()
+        self._txn_lock = asyncio.Lock()
+        self._txn_owner = None
+        self._txn_depth = 0
+        self._txn_changes = []
+        self._subscriptions = subscriptions_for(cog_name)
+
+    async def _run(self, func, *args):
+        loop = asyncio.get_event_loop()
+        return await loop.run_in_executor(self._executor, functools.partial(func, *args))
+
+    # Everything below down to the coroutines runs on the worker thread.
+
+    def _connect(self):
+        if self._conn is None:
+            log.debug(f"Opening database {self.data_path}")
+            self._conn = sqlite3.connect(
+                str(self.data_path), isolation_level=None, check_same_thread=False
+            )
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute("PRAGMA synchronous=NORMAL")
+            self._load_tables()
+        return self._conn
+
+    def _load_tables(self):
+        rows = self._conn.execute("SELECT name FROM sqlite_master WHERE type='table'")
+        self._tables = {row[0] for row in rows}
+
+    def _execute(self, sql, params=()):
+        return self._connect().execute(sql, params)
+
+    def _rollback_to(self, name):
+        self._execute(f"ROLLBACK TO {name}")
+        self._execute(f"RELEASE {name}")
+        self._load_tables()
+
+    def _atomic(self, func, *args):
+        self._execute("SAVEPOINT op")
+        try:
+            ret = func(*args)
+        except Exception:
+            self._rollback_to("op")
+            raise
+        self._execute("RELEASE op")
+        return ret
+
+    def _split(self, identifiers):
+        scope = identifiers[0]
+        n = self.key_lengths.get(scope, 1)
+        return scope, n, tuple(identifiers[1:n + 1]), identifiers[n + 1:]
+
+    def _ensure_table(self, scope, n):
+        if scope in self._tables:
+            return
+        if not scope.isidentifier():
+            raise ValueError(f"'{scope}' is an invalid scope name.")
+        keys = ", ".join(f"k{i}" for i in range(1, n + 1))
+        columns = ", ".join(f"k{i} TEXT NOT NULL" for i in range(1, n + 1))
+        self._execute(
+            f'CREATE TABLE IF NOT EXISTS "{scope}" '
+            f"({columns}, data TEXT NOT NULL, PRIMARY KEY ({keys})) WITHOUT ROWID"
+        )
+        self._tables.add(scope)
+
+    @staticmethod
+    def _where(keys):
+        if not keys:
+            return ""
+        return " WHERE " + " AND ".join(f"k{i} = ?" for i in range(1, len(keys) + 1))
+
+    def _fetch_row(self, scope, keys):
+        row = self._execute(
+            f'SELECT data FROM "{scope}"{self._where(keys)}', keys
+        ).fetchone()
+        if row is None:
+            raise KeyError(keys)
+        return json.loads(row[0])
+
+    def _write_row(self, scope, keys, data):
+        marks = ", ".join("?" * (len(keys) + 1))
+        self._execute(
+            f'INSERT OR REPLACE INTO "{scope}" VALUES ({marks})',
+            (*keys, json.dumps(data, **COMPACT)),
+        )
+
+    def _get(self, identifiers):
+        self._connect()
+        if not identifiers:
+            return {scope: self._get((scope,)) for scope in self._tables}
+        scope, n, keys, path = self._split(identifiers)
+        if scope not in self._tables:
+            raise KeyError(scope)
+        if len(keys) == n:
+            partial = self._fetch_row(scope, keys)
+            for i in path:
+                partial = partial[i]
+            return partial
+
+        ret = {}
+        rows = self._execute(f'SELECT * FROM "{scope}"{self._where(keys)}', keys)
+        for *row_keys, data in rows:
+            partial = ret
+            for k in row_keys[len(keys):-1]:
+                partial = partial.setdefault(k, {})
+            partial[row_keys[-1]] = json.loads(data)
+        if keys and not ret:
+            raise KeyError(keys)
+        return ret
+
+    def _get_or_none(self, identifiers):
+        try:
+            return self._get(identifiers)
+        except KeyError:
+            return None
+
+    def _set(self, identifiers, value):
+        self._connect()
+        if not identifiers:
+            self._clear(())
+            for scope, data in value.items():
+                self._set((scope,), data)
+            return
+        scope, n, keys, path = self._split(identifiers)
+        self._ensure_table(scope, n)
+        if len(keys) == n:
+            if path:
+                try:
+                    data = self._fetch_row(scope, keys)
+                except KeyError:
+                    data = {}
+                partial = data
+                for i in path[:-1]:
+                    if i not in partial:
+                        partial[i] = {}
+                    partial = partial[i]
+                partial[path[-1]] = value
+            else:
+                data = value
+            self._write_row(scope, keys, data)
+            return
+
+        # A whole range of rows is being replaced.
+        self._execute(f'DELETE FROM "{scope}"{self._where(keys)}', keys)
+        for row_keys, data in self._flatten(value, n - len(keys), keys):
+            self._write_row(scope, row_keys, data)
+
+    def _flatten(self, value, depth, keys):
+        if depth == 0:
+            yield keys, value
+            return
+        for k, v in value.items():
+            yield from self._flatten(v, depth - 1, (*keys, k))
+
+    def _clear(self, identifiers) -> bool:
+        self._connect()
+        if not identifiers:
+            for scope in self._tables:
+                self._execute(f'DROP TABLE "{scope}"')
+            self._tables = set()
+            return True
+        scope, n, keys, path = self._split(identifiers)
+        if scope not in self._tables:
+            return False
+        if not keys:
+            self._execute(f'DROP TABLE "{scope}"')
+            self._tables.discard(scope)
+            return True
+        if len(keys) == n and path:
+            try:
+                data = self._fetch_row(scope, keys)
+                partial = data
+                for i in path[:-1]:
+                    partial = partial[i]
+                del partial[path[-1]]
+            except KeyError:
+                return False
+            self._write_row(scope, keys, data)
+            return True
+        cursor = self._execute(f'DELETE FROM "{scope}"{self._where(keys)}', keys)
+        return cursor.rowcount > 0
+
+    def _keys(self, identifiers):
+        self._connect()
+        if not identifiers:
+            return list(self._tables)
+        scope, n, keys, path = self._split(identifiers)
+        if len(keys) == n:
+            return list(self._get(identifiers))
+        if scope not in self._tables:
+            raise KeyError(scope)
+        column = f"k{len(keys) + 1}"
+        rows = self._execute(
+            f'SELECT DISTINCT {column} FROM "{scope}"{self._where(keys)}', keys
+        ).fetchall()
+        if keys and not rows:
+            raise KeyError(keys)
+        return [row[0] for row in rows]
+
+    async def keys(self, *identifiers) -> list:
+        """Get the keys of the dict at the given path."""
+        return await self._run(self._keys, identifiers)
+
+    async def get(self, *identifiers, frozen: bool = False):
+        """Get the data at the given path.
+
+        The data is decoded from the database on every call, so it is always
+        a private copy. ``frozen`` returns it as a read-only view for
+        compatibility with the JSON driver.
+        """
+        ret = await self._run(self._get, identifiers)
+        return freeze(ret) if frozen else ret
+
+    async def _wait_for_transaction(self):
+        """Wait until no other task has a transaction open."""
+        while self._txn_owner is not None and self._txn_owner is not _current_task():
+            with await self._txn_lock:
+                pass
+
+    async def set(self, *identifiers, value):
+        await self._wait_for_transaction()
+        await self._run(self._atomic, self._set, identifiers, value)
+        self._changed(identifiers, value)
+
+    async def clear(self, *identifiers):
+        await self._wait_for_transaction()
+        if await self._run(self._atomic, self._clear, identifiers):
+            self._changed(identifiers, None)
+
+    def subscribe(self, identifiers, callback):
+        """Call ``callback`` after the data at ``identifiers`` changes.
+
+        See `core.utils.subscriptions.Subscriptions.subscribe`.
+        """
+        return self._subscriptions.subscribe(identifiers, callback)
+
+    def _changed(self, identifiers, value):
+        if self._txn_depth and self._txn_owner is _current_task():
+            self._txn_changes.append((identifiers, value))
+        else:
+            self._subscriptions.notify(identifiers, value)
+
+    def transaction(self):
+        """Group several mutations into one database transaction.
+
+        If the ``async with`` block raises, all of its mutations are rolled
+        back.
+
+        Only one task at a time may have a transaction open. Transactions
+        and mutations of other tasks wait until the block exits, so it must
+        not wait for them itself.
+
+        """
+        return _Transaction(self)
+
+    async def flush(self):
+        """Every mutation is committed as it is made, so this does nothing."""
+        pass
@@ -0,0 +1,106 @@
+import asyncio
+import logging
+
+from core.utils.frozen import freeze
+
+__all__ = ["Subscriptions", "subscriptions_for"]
+
+log = logging.getLogger("tbv.config")
+
+
+class _Node:
+    __slots__ = ("children", "callbacks")
+
+    def __init__(self):
+        self.children = {}
+        self.callbacks = []
+
+
+class Subscriptions:
+    """Callbacks subscribed to changes of a cog's data.
+
+    Subscriptions are kept in a trie keyed by identifiers, so a change only
+    visits the subscriptions on its own path and below it, no matter how many
+    there are in total.
+    """
+
+    def __init__(self):
+        self._root = _Node()
+
+    def subscribe(self, identifiers, callback):
+        """Call ``callback`` whenever the data at ``identifiers`` changes.
+
+        A change to data which contains ``identifiers``, or which is
+        contained by it, counts as a change too. ``callback`` is called with
+        the identifiers of the data which was changed, and its new value as
+        a read-only view, :code:`None` if it was cleared. If it returns a
+        coroutine, that is scheduled as a task.
+
+        Returns
+        -------
+        callable
+            Call to unsubscribe.
+
+        """
+        path = [self._root]
+        for i in identifiers:
+            path.append(path[-1].children.setdefault(i, _Node()))
+        path[-1].callbacks.append(callback)
+
+        def unsubscribe():
+            try:
+                path[-1].callbacks.remove(callback)
+            except ValueError:
+                return
+            # Prune nodes which lead to no subscriptions anymore.
+            for parent, node, key in zip(reversed(path[:-1]), reversed(path), reversed(identifiers)):
+                if node.callbacks or node.children:
+                    break
+                del parent.children[key]
+
+        return unsubscribe
+
+    def notify(self, identifiers, value=None):
+        """Call the callbacks subscribed to a change at ``identifiers``."""
+        node = self._root
+        callbacks = list(node.callbacks)
+        for i in identifiers:
+            node = node.children.get(i)
+            if node is None:
+                break
+            callbacks.extend(node.callbacks)
+        else:
+            stack = list(node.children.values())
+            while stack:
+                node = stack.pop()
+                callbacks.extend(node.callbacks)
+                stack.extend(node.children.values())
+        if not callbacks:
+            return
+
+        value = freeze(value)
+        for callback in callbacks:
+            try:
+                ret = callback(identifiers, value)
+                if asyncio.iscoroutine(ret):
+                    asyncio.ensure_future(_log_errors(ret))
+            except Exception:
+                log.exception(f"Error in config change callback {callback!r}")
+
+
+async def _log_errors(coro):
+    try:
+        await coro
+    except Exception:
+        log.exception("Error in config change callback")
+
+
+_shared_subscriptions = {}
+
+
+def subscriptions_for(cog_name: str) -> Subscriptions:
+    """Get the subscriptions to a cog's data, shared by all its drivers."""
+    try:
+        return _shared_subscriptions[cog_name]
+    except KeyError:
+        return _shared_subscriptions.setdefault(cog_name, Subscriptions())